@@ -0,0 +1,103 @@
+import queue
+import threading
+import time
+from crewai.utilities.events import (
+    crewai_event_bus,
+    LLMStreamChunkEvent,
+    ToolUsageErrorEvent,
+    ToolUsageFinishedEvent,
+    ToolUsageStartedEvent,
+)
+from utils.agent_runner import AGENT_MAX_CONCURRENCY
+from utils.streaming import forward_crew_events
+from utils.timing import stage, time_tool_events
+
+# the utils stay CrewAI-free for the test routes; hook them to the bus once the agents load
+time_tool_events(crewai_event_bus, ToolUsageStartedEvent, ToolUsageFinishedEvent, ToolUsageErrorEvent)
+forward_crew_events(crewai_event_bus, ToolUsageStartedEvent, ToolUsageFinishedEvent, ToolUsageErrorEvent,
+                    LLMStreamChunkEvent)
+
+
+class CrewPool:
+    """
+    Per-worker pool of pre-built crews. Agent executors keep per-run state,
+    so a crew serves one request at a time; the pool holds one per agent
+    worker thread and requests only bind their task inputs at kickoff.
+    """
+
+    def __init__(self, build, size: int = AGENT_MAX_CONCURRENCY):
+        self.build = build
+        self.size = size
+        self.idle = queue.LifoQueue()
+        self.created = 0
+        self.lock = threading.Lock()
+        self.leases = 0
+        self.wait_seconds = 0.0
+        self.build_seconds = 0.0
+
+    def warm(self):
+        """Build every crew up front instead of on first use"""
+        while self._grow():
+            pass
+
+    def _grow(self):
+        with self.lock:
+            if self.created >= self.size:
+                return False
+            self.created += 1
+        started = time.perf_counter()
+        try:
+            crew = self.build()
+        except Exception:
+            # give the slot back, or acquire() would wait for a crew that never arrives
+            with self.lock:
+                self.created -= 1
+            raise
+        with self.lock:
+            self.build_seconds += time.perf_counter() - started
+        self.idle.put(crew)
+        return True
+
+    def acquire(self):
+        started = time.perf_counter()
+        if self.idle.empty():
+            self._grow()
+        crew = self.idle.get()
+        with self.lock:
+            self.leases += 1
+            self.wait_seconds += time.perf_counter() - started
+        return crew
+
+    def release(self, crew):
+        self.idle.put(crew)
+
+    def lease(self, inputs: dict):
+        return CrewLease(self, inputs)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "size": self.size,
+                "created": self.created,
+                "idle": self.idle.qsize(),
+                "leases": self.leases,
+                "avg_acquire_ms": round(self.wait_seconds / self.leases * 1000, 3) if self.leases else 0.0,
+                "avg_build_ms": round(self.build_seconds / self.created * 1000, 3) if self.created else 0.0,
+            }
+
+
+class CrewLease:
+    """What get_*_crew returns: kickoff() borrows a pooled crew for one run."""
+
+    def __init__(self, pool: CrewPool, inputs: dict):
+        self.pool = pool
+        self.inputs = inputs
+
+    def kickoff(self):
+        with stage("crew_acquire"):
+            crew = self.pool.acquire()
+        try:
+            with stage("crew"):
+                return crew.kickoff(inputs=self.inputs)
+        finally:
+            self.pool.release(crew)
@@ -1,43 +1,56 @@
-import os
-from dotenv import load_dotenv
-from crewai import Agent, Task, Crew, LLM
+from crewai import Agent, Task, Crew
 from crewai.tools import tool
+from agents.llm import get_llm, get_translation_llm
+from agents.crew_pool import CrewPool
 from tools.mongodb_tool import MongoDBTool
+from utils.compact import compact
 from utils.translate import translate_to_english
 from tools.memory_backend import MongoMemoryBackend
+from utils.timing import stage
 
 memory_backend = MongoMemoryBackend()
 
-load_dotenv()
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-
-if not GOOGLE_API_KEY:
-    raise ValueError("GOOGLE_API_KEY not found in environment variables.")
+mongo = MongoDBTool()
 
-llm = LLM(
-    model="gemini/gemini-1.5-flash",
-    api_key=GOOGLE_API_KEY,
-    temperature=0.7
-)
 
 
-mongo = MongoDBTool()
-
+@tool("Get Multiple Metrics")
+def get_metrics(metrics: str) -> str:
+    """Fetch several metrics at once, in parallel. Pass a comma-separated list of: total_revenue, daily_revenue, outstanding_payments, client_counts, new_clients_this_month, enrollment_trends, top_services, course_completion_rates, attendance_percentage:<class name>, kpis. Use this instead of calling several single-metric tools in a row."""
+    try:
+        return compact(mongo.get_metrics(metrics.split(",")))
+    except Exception as e:
+        return f"Error retrieving metrics: {str(e)}"
 
+@tool("Get Dashboard KPIs")
+def get_dashboard_kpis() -> str:
+    """Fetch revenue, outstanding payments, active/inactive clients, new clients this month and per-class attendance in one call. Prefer this when several of these metrics are needed."""
+    try:
+        return compact(mongo.get_dashboard_kpis())
+    except Exception as e:
+        return f"Error retrieving dashboard KPIs: {str(e)}"
 
 @tool("Get Total Revenue")
 def get_total_revenue() -> str:
     """Fetch total revenue from all completed payments."""
     try:
-        return str(mongo.get_total_revenue())
+        return compact(mongo.get_total_revenue())
     except Exception as e:
         return f"Error calculating total revenue: {str(e)}"
 
+@tool("Get Daily Revenue")
+def get_daily_revenue(days: int = 30) -> str:
+    """Revenue and payment count per day for the last N days (default 30)."""
+    try:
+        return compact(mongo.get_daily_revenue(days))
+    except Exception as e:
+        return f"Error retrieving daily revenue: {str(e)}"
+
 @tool("Get Outstanding Payments")
 def get_outstanding_payments() -> str:
     """Calculate all unpaid/pending order totals."""
     try:
-        return str(mongo.get_outstanding_payments())
+        return compact(mongo.get_outstanding_payments())
     except Exception as e:
         return f"Error retrieving outstanding payments: {str(e)}"
 
@@ -45,7 +58,7 @@ def get_outstanding_payments() -> str:
 def count_active_inactive_clients() -> str:
     """Count number of active and inactive clients."""
     try:
-        return str(mongo.count_active_inactive_clients())
+        return compact(mongo.count_active_inactive_clients())
     except Exception as e:
         return f"Error counting clients: {str(e)}"
 
@@ -53,7 +66,7 @@ def count_active_inactive_clients() -> str:
 def get_new_clients_this_month() -> str:
     """Count new client registrations for the current month."""
     try:
-        return str(mongo.get_new_clients_this_month())
+        return compact(mongo.get_new_clients_this_month())
     except Exception as e:
         return f"Error retrieving new clients: {str(e)}"
 
@@ -61,7 +74,7 @@ def get_new_clients_this_month() -> str:
 def get_enrollment_trends() -> str:
     """Analyze most enrolled courses/classes."""
     try:
-        return str(mongo.get_enrollment_trends())
+        return compact(mongo.get_enrollment_trends())
     except Exception as e:
         return f"Error retrieving enrollment trends: {str(e)}"
 
@@ -69,7 +82,7 @@ def get_enrollment_trends() -> str:
 def get_top_services() -> str:
     """List top 5 services by revenue."""
     try:
-        return str(mongo.get_top_services())
+        return compact(mongo.get_top_services())
     except Exception as e:
         return f"Error retrieving top services: {str(e)}"
 
@@ -77,21 +90,24 @@ def get_top_services() -> str:
 def get_course_completion_rates() -> str:
     """Fetch course counts grouped by completion status."""
     try:
-        return str(mongo.get_course_completion_rates())
+        return compact(mongo.get_course_completion_rates())
     except Exception as e:
         return f"Error retrieving completion rates: {str(e)}"
 
 @tool("Get Attendance Percentage")
 def get_attendance_percentage(class_name: str) -> str:
-    """Return attendance % for a specific class name."""
+    """Return attendance % for a class. A class name combines every class with that name (the result says how many); pass a class_id such as CLASS_0001 for one class."""
     try:
-        return str(mongo.get_attendance_percentage(class_name))
+        return compact(mongo.get_attendance_percentage(class_name))
     except Exception as e:
         return f"Error calculating attendance percentage: {str(e)}"
 
 
 dashboard_tools = [
+    get_metrics,
+    get_dashboard_kpis,
     get_total_revenue,
+    get_daily_revenue,
     get_outstanding_payments,
     count_active_inactive_clients,
     get_new_clients_this_month,
@@ -102,22 +118,23 @@ dashboard_tools = [
 ]
 
 
-dashboard_agent = Agent(
-    role="Business Analytics Agent",
-    goal="Provide analytics and metrics useful for business owners",
-    backstory="Business intelligence expert for fitness studio analytics.",
-    tools=dashboard_tools,
-    llm=llm,
-    verbose=True,
-    max_iter=3,
-    allow_delegation=False
-)
+def create_dashboard_agent():
+    return Agent(
+        role="Business Analytics Agent",
+        goal="Provide analytics and metrics useful for business owners",
+        backstory="Business intelligence expert for fitness studio analytics.",
+        tools=dashboard_tools,
+        llm=get_llm(),
+        verbose=True,
+        max_iter=3,
+        allow_delegation=False
+    )
 
-#task builder
-def create_dashboard_task(prompt: str):
+#task builder; {query} is filled in per request by crew.kickoff(inputs=...)
+def create_dashboard_task(agent):
     return Task(
-        description=f"""
-        User Query: {prompt}
+        description="""
+        User Query: {query}
 
         Instructions:
         - Analyze the business-related query
@@ -126,28 +143,38 @@ def create_dashboard_task(prompt: str):
         - Keep it data-driven, professional, and insightful
         """,
         expected_output="A clear business insight or metric-driven answer",
-        agent=dashboard_agent
+        agent=agent
+    )
+
+def build_dashboard_crew():
+    agent = create_dashboard_agent()
+    return Crew(
+        agents=[agent],
+        tasks=[create_dashboard_task(agent)],
+        verbose=True,
+        memory=False
     )
 
+dashboard_crews = CrewPool(build_dashboard_crew)
+
 #crew builder
-def get_dashboard_crew(prompt: str, session_id: str = "default_user"):
+def get_dashboard_crew(prompt: str, session_id: str = "default_user", use_memory: bool = True):
     try:
-        memory_log = memory_backend.get_memory(session_id)
-        memory_context = "\n".join(memory_log)
-
-        translated_prompt = translate_to_english(llm, prompt)
+        # use_memory=False for prompts whose answer is cached across sessions
+        memory_context = ""
+        if use_memory:
+            with stage("memory", "get"):
+                memory_log = memory_backend.get_memory(session_id)
+            memory_context = "\n".join(memory_log)
+
+        with stage("translate"):
+            translated_prompt = translate_to_english(get_translation_llm(), prompt)
         full_prompt = f"{memory_context}\n\nNew Query: {translated_prompt}"
 
-        memory_backend.save_memory(session_id, translated_prompt)
+        with stage("memory", "save"):
+            memory_backend.save_memory(session_id, translated_prompt)
 
-        task = create_dashboard_task(full_prompt)
-        return Crew(
-            agents=[dashboard_agent],
-            tasks=[task],
-            verbose=True,
-            memory=False
-        )
+        return dashboard_crews.lease({"query": full_prompt})
     except Exception as e:
         print(f"Error creating dashboard crew: {e}")
         raise
-
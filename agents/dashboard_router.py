@@ -0,0 +1,139 @@
+"""
+Deterministic fast path for dashboard prompts that map to one MongoDBTool
+metric ("what's our total revenue?", "active vs inactive clients"). The
+prompt's content words are scored against each rule's vocabulary; only a
+confident, unambiguous match is answered here from a template, everything
+else goes to the dashboard crew.
+"""
+import os
+import re
+import threading
+from tools.mongodb_tool import MongoDBTool
+from utils.translate import is_english
+
+ROUTER_ENABLED = os.getenv("ROUTER_ENABLED", "true").lower() == "true"
+# share of the prompt's content words a rule must explain
+ROUTER_MIN_CONFIDENCE = float(os.getenv("ROUTER_MIN_CONFIDENCE", "0.75"))
+
+# numbers are kept: no rule explains "top 3" or "in 2024", so they lower confidence
+WORD_RE = re.compile(r"[a-z]+|\d+")
+
+# words that carry no metric meaning and are ignored when scoring
+FILLER = frozenset("""
+a an the s is are was what whats how much do does did we us our i me my you
+show tell give get list please can could would of for in on to from by at so far right
+now currently current there have has had it its this that and or vs versus about
+""".split())
+
+
+class Rule:
+    def __init__(self, metric, required, vocab, render):
+        self.metric = metric
+        self.required = frozenset(required)
+        self.vocab = frozenset(vocab) | self.required
+        self.render = render
+
+    def score(self, words):
+        if not words or not self.required & words:
+            return 0.0
+        return len(self.vocab & words) / len(words)
+
+
+def _amount(value):
+    return f"{value:,.2f}"
+
+def _ranked(rows, key, label):
+    lines = [f"{i}. {row['_id']} — {label(row[key])}" for i, row in enumerate(rows, 1)]
+    return "\n".join(lines) if lines else "No data available yet."
+
+RULES = [
+    Rule("get_total_revenue",
+         required={"revenue", "earnings", "income", "sales", "earned"},
+         vocab={"total", "overall", "all", "time", "much", "money", "gross"},
+         render=lambda v: f"Total revenue from all completed payments is {_amount(v)}."),
+    Rule("get_outstanding_payments",
+         # a money total: "pending" alone ("how many pending orders") is a count question for the crew
+         required={"outstanding", "unpaid", "dues", "owed"},
+         vocab={"pending", "payments", "payment", "amount", "amounts", "total", "money", "due", "summary"},
+         render=lambda v: f"Outstanding (pending) payments total {_amount(v)}."),
+    Rule("count_active_inactive_clients",
+         required={"active", "inactive"},
+         vocab={"clients", "client", "customers", "members", "count", "number", "total", "many"},
+         render=lambda v: f"There are {v['active']} active and {v['inactive']} inactive clients."),
+    Rule("get_new_clients_this_month",
+         required={"new"},
+         vocab={"clients", "client", "customers", "members", "registrations", "signups", "registered",
+                "joined", "month", "count", "number", "many"},
+         render=lambda v: f"{v['new_clients_this_month']} new clients registered this month."),
+    Rule("get_top_services",
+         required={"top", "best", "highest", "most"},
+         vocab={"services", "service", "revenue", "earning", "grossing", "generate", "which", "courses",
+                "classes", "five", "5", "selling"},
+         render=lambda v: "Top services by revenue:\n" + _ranked(v, "total", _amount)),
+    Rule("get_enrollment_trends",
+         required={"enrollment", "enrollments", "enrolled", "popular", "trends", "trend"},
+         vocab={"courses", "classes", "services", "most", "which", "analysis"},
+         render=lambda v: "Enrollments by service:\n" + _ranked(v, "count", lambda n: f"{n} orders")),
+    Rule("get_course_completion_rates",
+         required={"completion", "completed"},
+         vocab={"course", "courses", "rate", "rates", "statistics", "stats", "status"},
+         render=lambda v: "Courses by status:\n" + _ranked(v, "count", lambda n: f"{n} courses")),
+]
+
+
+class DashboardRouter:
+    def __init__(self, rules=RULES, min_confidence: float = ROUTER_MIN_CONFIDENCE):
+        self.rules = rules
+        self.min_confidence = min_confidence
+        self.mongo = MongoDBTool()
+        self.lock = threading.Lock()
+        self.counts = {"routed": 0, "fallback": 0, "errors": 0}
+        self.by_metric = {rule.metric: 0 for rule in rules}
+
+    def match(self, prompt: str):
+        """Best rule and its confidence, or (None, score) when ambiguous or weak"""
+        words = {w for w in WORD_RE.findall(prompt.lower()) if w not in FILLER}
+        scored = sorted(((rule.score(words), rule) for rule in self.rules), key=lambda x: x[0], reverse=True)
+        best_score, best = scored[0]
+        runner_up = scored[1][0] if len(scored) > 1 else 0.0
+        if best_score < self.min_confidence or runner_up >= self.min_confidence:
+            return None, best_score
+        return best, best_score
+
+    def route(self, prompt: str):
+        """Templated answer for a confident single-metric prompt, else None"""
+        rule = None
+        if ROUTER_ENABLED and is_english(prompt):
+            rule, _ = self.match(prompt)
+        if rule is None:
+            self._count(None)
+            return None
+
+        value = getattr(self.mongo, rule.metric)()
+        self._count(rule.metric)
+        return {"raw": rule.render(value), "routed_to": rule.metric}
+
+    def _count(self, metric):
+        with self.lock:
+            if metric:
+                self.counts["routed"] += 1
+                self.by_metric[metric] += 1
+            else:
+                self.counts["fallback"] += 1
+
+    def record_error(self):
+        """A matched metric that raised; the caller falls back to the crew"""
+        with self.lock:
+            self.counts["errors"] += 1
+
+    def stats(self):
+        with self.lock:
+            total = sum(self.counts.values())
+            return {
+                **self.counts,
+                "bypass_rate": round(self.counts["routed"] / total, 4) if total else 0.0,
+                "by_metric": dict(self.by_metric),
+            }
+
+
+dashboard_router = DashboardRouter()
@@ -0,0 +1,132 @@
+"""
+Deterministic offline stand-in for the provider, selected with
+LLM_BACKEND=fake. It answers in CrewAI's ReAct format: the first call picks
+one tool from the "New Query:" line by keyword, and once CrewAI has appended
+that tool's Observation it returns a Final Answer quoting it. Translation
+prompts are echoed back. Latency is simulated per call so load tests see
+realistic queueing without hitting Gemini.
+"""
+import hashlib
+import json
+import os
+import random
+import re
+import time
+from crewai.llms.base_llm import BaseLLM
+from utils.timing import stage
+
+FAKE_LLM_LATENCY_MS = float(os.getenv("FAKE_LLM_LATENCY_MS", "800"))
+FAKE_LLM_JITTER_MS = float(os.getenv("FAKE_LLM_JITTER_MS", "200"))
+
+QUERY_RE = re.compile(r"New Query:\s*(.*)", re.IGNORECASE)
+TRANSLATE_RE = re.compile(r'Translate this text to English:\s*"(.*)"', re.DOTALL)
+ORDER_ID_RE = re.compile(r"\bORDER_\d+\b")
+CLIENT_ID_RE = re.compile(r"\bCLIENT_\d+\b")
+CAPITALIZED_RE = re.compile(r"\b[A-Z][a-z]+\b")
+
+
+def _order_id(query):
+    match = ORDER_ID_RE.search(query)
+    return match.group(0) if match else "ORDER_00001"
+
+def _client_id(query):
+    match = CLIENT_ID_RE.search(query)
+    return match.group(0) if match else "CLIENT_0001"
+
+def _name(query):
+    names = CAPITALIZED_RE.findall(query)
+    return names[-1] if names else query.split()[-1] if query.split() else ""
+
+# (pattern on the lowered query, tool name, Action Input builder); first
+# match among the tools offered to the agent wins
+SCRIPT = [
+    (r"\bdaily\b|per day", "Get Daily Revenue", lambda q: {"days": 30}),
+    (r"\bkpi|overview|summary|dashboard", "Get Dashboard KPIs", lambda q: {}),
+    (r"outstanding|unpaid", "Get Outstanding Payments", lambda q: {}),
+    (r"revenue|sales|earn", "Get Total Revenue", lambda q: {}),
+    (r"\binactive\b|\bactive\b", "Count Active vs Inactive Clients", lambda q: {}),
+    (r"new client|signup|registration", "Get New Clients This Month", lambda q: {}),
+    (r"\btop\b|\bbest\b", "Get Top Services", lambda q: {}),
+    (r"enrol|trend|popular", "Get Enrollment Trends", lambda q: {}),
+    (r"completion", "Get Course Completion Rates", lambda q: {}),
+    (r"attendance", "Get Attendance Percentage", lambda q: {"class_name": _name(q)}),
+    (r"payment", "Get Payment Details", lambda q: {"order_id": _order_id(q)}),
+    (r"\border_\d+", "Get Order by ID", lambda q: {"order_id": _order_id(q)}),
+    (r"dues|owe", "Calculate Pending Dues", lambda q: {"client_id": _client_id(q)}),
+    (r"instructor|taught|teach", "Filter Classes by Instructor", lambda q: {"instructor_name": _name(q)}),
+    (r"\b(pending|paid|cancelled)\b", "Filter Orders by Status",
+     lambda q: {"status": re.search(r"\b(pending|paid|cancelled)\b", q.lower()).group(1)}),
+    (r"orders", "Get Orders by Client", lambda q: {"client_id": _client_id(q)}),
+    (r"class|schedule|upcoming", "List Upcoming Classes", lambda q: {}),
+    (r"client|customer|find|search", "Search Clients", lambda q: {"query": _name(q)}),
+]
+
+
+def _text(messages) -> str:
+    if isinstance(messages, str):
+        return messages
+    return "\n".join(str(m.get("content", "")) for m in messages)
+
+def _latest(messages) -> str:
+    if isinstance(messages, str):
+        return messages
+    return str(messages[-1].get("content", "")) if messages else ""
+
+def _observation(latest: str):
+    """
+    The tool result CrewAI appended after our last Action, or None. The
+    ReAct format in CrewAI's own system prompt also reads "Action Input:
+    ... Observation: the result of the action", so that text does not count.
+    """
+    _, found, tail = latest.rpartition("Action Input:")
+    if not found or "Observation:" not in tail:
+        return None
+    observation = tail.split("Observation:", 1)[1].strip()
+    return None if observation.startswith("the result of the action") else observation
+
+
+class FakeLLM(BaseLLM):
+    def __init__(self, model: str = "fake/scripted", latency_ms: float = FAKE_LLM_LATENCY_MS,
+                 jitter_ms: float = FAKE_LLM_JITTER_MS):
+        super().__init__(model=model, temperature=0)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None, **kwargs):
+        text = _text(messages)
+        with stage("llm", self.model):
+            self._sleep(text)
+            return self.respond(text, _latest(messages))
+
+    def _sleep(self, text):
+        # jitter is seeded by the prompt, so a rerun reproduces the same delays
+        seed = int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "big")
+        jitter = random.Random(seed).uniform(-self.jitter_ms, self.jitter_ms)
+        time.sleep(max(0.0, self.latency_ms + jitter) / 1000)
+
+    def respond(self, text: str, latest: str = None) -> str:
+        translation = TRANSLATE_RE.search(text)
+        if translation:
+            return translation.group(1)
+
+        observation = _observation(text if latest is None else latest)
+        if observation is not None:
+            return f"Thought: I now know the final answer\nFinal Answer: {observation[:1000]}"
+
+        queries = QUERY_RE.findall(text)
+        query = queries[-1].strip() if queries else ""
+        for pattern, tool_name, build_args in SCRIPT:
+            if tool_name in text and re.search(pattern, query.lower()):
+                return (f"Thought: I should use {tool_name}\n"
+                        f"Action: {tool_name}\n"
+                        f"Action Input: {json.dumps(build_args(query))}")
+        return f"Thought: I now know the final answer\nFinal Answer: I could not find a tool for: {query}"
+
+    def supports_function_calling(self) -> bool:
+        return False
+
+    def supports_stop_words(self) -> bool:
+        return True
+
+    def get_context_window_size(self) -> int:
+        return 128000
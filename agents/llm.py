@@ -0,0 +1,93 @@
+import json
+import os
+import threading
+from dotenv import load_dotenv
+from crewai import LLM
+from utils.rate_limit import llm_bucket, llm_coalescer, llm_retrier
+
+from utils.streaming import begin_llm_call, replay_llm_result
+from utils.timing import stage
+
+load_dotenv()
+
+# "gemini" calls the provider through litellm; "fake" is the offline stand-in for load tests
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini").lower()
+GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+
+LLM_MODEL = os.getenv("LLM_MODEL", "gemini/gemini-1.5-flash")
+LLM_STREAM = os.getenv("LLM_STREAM", "true").lower() == "true"
+
+
+class GovernedLLM(LLM):
+    """
+    LLM whose provider calls go through the process-wide token bucket,
+    retry 429/5xx with backoff, and coalesce identical in-flight calls.
+    """
+
+    def call(self, messages, *args, **kwargs):
+        # callbacks and tool function objects differ per call but not per prompt
+        key = json.dumps([self.model, self.stream, messages, args, {k: v for k, v in kwargs.items()
+                          if k not in ("callbacks", "available_functions", "from_task", "from_agent")}],
+                         sort_keys=True, default=str)
+        call = super().call
+        attempts = []
+
+        def limited():
+            llm_bucket.acquire()
+            # every attempt (including retries) restarts the stream's answer
+            begin_llm_call()
+            attempts.append(1)
+            with stage("llm", self.model):
+                return call(messages, *args, **kwargs)
+
+        result = llm_coalescer.run(key, lambda: llm_retrier.run(limited))
+        if self.stream and not attempts:
+            # a coalesced follower streamed nothing itself; send it the shared answer
+            replay_llm_result(str(result))
+        return result
+
+
+_llms = {}
+_llm_lock = threading.Lock()
+
+
+def llm_configured() -> bool:
+    return LLM_BACKEND == "fake" or bool(GOOGLE_API_KEY)
+
+def get_llm():
+    """
+    The LLM shared by both agents, built on first use so processes that
+    never call an agent need no credentials.
+    """
+    return _shared_llm(stream=LLM_STREAM)
+
+def get_translation_llm():
+    """
+    Non-streaming twin of get_llm for translate_to_english: it runs on the
+    crew's thread, so streamed chunks would reach the client as answer tokens.
+    """
+    return _shared_llm(stream=False)
+
+def _shared_llm(stream: bool):
+    llm = _llms.get(stream)
+    if llm is None:
+        with _llm_lock:
+            llm = _llms.get(stream)
+            if llm is None:
+                llm = _llms[stream] = _build_llm(stream)
+    return llm
+
+def _build_llm(stream: bool):
+    if LLM_BACKEND == "fake":
+        from agents.fake_llm import FakeLLM
+        return FakeLLM()
+    if not GOOGLE_API_KEY:
+        raise ValueError("GOOGLE_API_KEY not found in environment variables. Please add it to your .env file.")
+
+    return GovernedLLM(
+        model=LLM_MODEL,
+        api_key=GOOGLE_API_KEY,
+        temperature=0.7,
+        # chunks are forwarded to /query/stream clients by utils/streaming.py
+        stream=stream
+    )
@@ -1,49 +1,36 @@
-import os
-from dotenv import load_dotenv
-from crewai import Agent, Task, Crew, LLM
+from crewai import Agent, Task, Crew
 from crewai.tools import tool
+from agents.llm import get_llm, get_translation_llm
+from agents.crew_pool import CrewPool
 from tools.mongodb_tool import MongoDBTool
+from utils.compact import compact, compact_page
 from tools.external_api_tool import ExternalAPITool
 from utils.translate import translate_to_english
 from tools.memory_backend import MongoMemoryBackend
+from utils.timing import stage
 
 memory_backend = MongoMemoryBackend()
 
-load_dotenv()
-
-
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-
-if not GOOGLE_API_KEY:
-    raise ValueError("GOOGLE_API_KEY not found in environment variables. Please add it to your .env file.")
-
-
-llm = LLM(
-    model="gemini/gemini-1.5-flash",
-    api_key=GOOGLE_API_KEY,
-    temperature=0.7
-)
-
 
 mongo = MongoDBTool()
 external = ExternalAPITool()
 
 
 @tool("Search Clients")
-def search_clients(query: str) -> str:
-    """Search for clients by name, email, or phone."""
+def search_clients(query: str, page_token: str = "") -> str:
+    """Search for clients by name, email, or phone. Names and emails match from the start of a word or address (an email domain alone will not match); phones match with or without the country code. Pass page_token from a previous call for more results."""
     try:
-        result = mongo.search_clients(query)
-        return str(result)
+        result = mongo.search_clients(query, page_token=page_token or None)
+        return compact_page(result)
     except Exception as e:
         return f"Error searching for clients: {str(e)}"
 
 @tool("Get Orders by Client")
-def get_orders_by_client(client_id: str) -> str:
-    """Get all orders for a client."""
+def get_orders_by_client(client_id: str, page_token: str = "") -> str:
+    """Get all orders for a client. Pass page_token from a previous call for more results."""
     try:
-        result = mongo.get_orders_by_client(client_id)
-        return str(result)
+        result = mongo.get_orders_by_client(client_id, page_token=page_token or None)
+        return compact_page(result)
     except Exception as e:
         return f"Error retrieving orders for client {client_id}: {str(e)}"
 
@@ -52,16 +39,16 @@ def get_order_by_id(order_id: str) -> str:
     """Retrieve an order using the order ID."""
     try:
         result = mongo.get_order_by_id(order_id)
-        return str(result)
+        return compact(result)
     except Exception as e:
         return f"Error retrieving order {order_id}: {str(e)}"
 
 @tool("Filter Orders by Status")
-def filter_orders_by_status(status: str) -> str:
-    """List orders by their payment status."""
+def filter_orders_by_status(status: str, page_token: str = "") -> str:
+    """List orders by their payment status. Pass page_token from a previous call for more results."""
     try:
-        result = mongo.filter_orders_by_status(status)
-        return str(result)
+        result = mongo.filter_orders_by_status(status, page_token=page_token or None)
+        return compact_page(result)
     except Exception as e:
         return f"Error filtering orders by status {status}: {str(e)}"
 
@@ -70,7 +57,7 @@ def get_payment_details(order_id: str) -> str:
     """Fetch payment details for an order."""
     try:
         result = mongo.get_payment_details(order_id)
-        return str(result)
+        return compact(result)
     except Exception as e:
         return f"Error retrieving payment details for order {order_id}: {str(e)}"
 
@@ -79,25 +66,25 @@ def calculate_pending_dues(client_id: str) -> str:
     """Calculate how much a client owes."""
     try:
         result = mongo.calculate_pending_dues(client_id)
-        return str(result)
+        return compact(result)
     except Exception as e:
         return f"Error calculating pending dues for client {client_id}: {str(e)}"
 
 @tool("List Upcoming Classes")
-def list_upcoming_classes() -> str:
-    """List upcoming scheduled classes."""
+def list_upcoming_classes(page_token: str = "") -> str:
+    """List upcoming scheduled classes. Pass page_token from a previous call for more results."""
     try:
-        result = mongo.list_upcoming_classes()
-        return str(result)
+        result = mongo.list_upcoming_classes(page_token=page_token or None)
+        return compact_page(result)
     except Exception as e:
         return f"Error retrieving upcoming classes: {str(e)}"
 
 @tool("Filter Classes by Instructor")
-def filter_classes_by_instructor(instructor_name: str) -> str:
-    """Find classes conducted by a specific instructor."""
+def filter_classes_by_instructor(instructor_name: str, page_token: str = "") -> str:
+    """Find classes conducted by a specific instructor. Pass page_token from a previous call for more results."""
     try:
-        result = mongo.filter_classes_by_instructor(instructor_name)
-        return str(result)
+        result = mongo.filter_classes_by_instructor(instructor_name, page_token=page_token or None)
+        return compact_page(result)
     except Exception as e:
         return f"Error retrieving classes for instructor {instructor_name}: {str(e)}"
 
@@ -106,7 +93,7 @@ def create_client_enquiry(enquiry_data: str) -> str:
     """Register a new client enquiry."""
     try:
         result = external.create_client_enquiry(enquiry_data)
-        return str(result)
+        return compact(result)
     except Exception as e:
         return f"Error creating client enquiry: {str(e)}"
 
@@ -115,7 +102,7 @@ def create_order(order_data: str) -> str:
     """Place a new service order for a client."""
     try:
         result = external.create_order(order_data)
-        return str(result)
+        return compact(result)
     except Exception as e:
         return f"Error creating order: {str(e)}"
 
@@ -134,24 +121,25 @@ support_tools = [
 ]
 
 
-support_agent = Agent(
-    role="Fitness Studio Support Specialist",
-    goal="Provide excellent customer service by handling inquiries about classes, orders, payments, and bookings with accuracy and professionalism",
-    backstory="""You are an experienced customer service specialist for a premium fitness studio. 
-    You have deep knowledge of fitness programs, class schedules, payment systems, and client management. 
-    You're known for being helpful, patient, and solution-oriented. You always strive to resolve 
-    client issues efficiently while maintaining a friendly and professional demeanor.""",
-    tools=support_tools,
-    llm=llm,
-    verbose=True,
-    max_iter=3,
-    allow_delegation=False
-)
-
-#task builder
-def create_support_task(prompt: str):
-    enhanced_description = f"""
-    User Query: {prompt}
+def create_support_agent():
+    return Agent(
+        role="Fitness Studio Support Specialist",
+        goal="Provide excellent customer service by handling inquiries about classes, orders, payments, and bookings with accuracy and professionalism",
+        backstory="""You are an experienced customer service specialist for a premium fitness studio. 
+        You have deep knowledge of fitness programs, class schedules, payment systems, and client management. 
+        You're known for being helpful, patient, and solution-oriented. You always strive to resolve 
+        client issues efficiently while maintaining a friendly and professional demeanor.""",
+        tools=support_tools,
+        llm=get_llm(),
+        verbose=True,
+        max_iter=3,
+        allow_delegation=False
+    )
+
+#task builder; {query} is filled in per request by crew.kickoff(inputs=...)
+def create_support_task(agent):
+    enhanced_description = """
+    User Query: {query}
 
     Instructions:
     1. Analyze the user's request carefully
@@ -168,28 +156,38 @@ def create_support_task(prompt: str):
         - Offers clear next steps or alternatives if needed
         - Maintains a professional and friendly tone
         - Includes relevant details like order numbers, dates, or amounts when applicable""",
-        agent=support_agent
+        agent=agent
+    )
+
+def build_support_crew():
+    agent = create_support_agent()
+    return Crew(
+        agents=[agent],
+        tasks=[create_support_task(agent)],
+        verbose=True,
+        memory=False
     )
 
+support_crews = CrewPool(build_support_crew)
+
 #crew builder
-def get_support_crew(prompt: str, session_id: str = "default_user"):
+def get_support_crew(prompt: str, session_id: str = "default_user", use_memory: bool = True):
     try:
-        memory_log = memory_backend.get_memory(session_id)
-        memory_context = "\n".join(memory_log)
-
-        translated_prompt = translate_to_english(llm, prompt)
+        # use_memory=False for prompts whose answer is cached across sessions
+        memory_context = ""
+        if use_memory:
+            with stage("memory", "get"):
+                memory_log = memory_backend.get_memory(session_id)
+            memory_context = "\n".join(memory_log)
+
+        with stage("translate"):
+            translated_prompt = translate_to_english(get_translation_llm(), prompt)
         full_prompt = f"{memory_context}\n\nNew Query: {translated_prompt}"
 
-        memory_backend.save_memory(session_id, translated_prompt)
+        with stage("memory", "save"):
+            memory_backend.save_memory(session_id, translated_prompt)
 
-        task = create_support_task(full_prompt)
-        return Crew(
-            agents=[support_agent],
-            tasks=[task],
-            verbose=True,
-            memory=False,
-            max_rpm=10
-        )
+        return support_crews.lease({"query": full_prompt})
     except Exception as e:
         print(f"Error creating crew: {e}")
         raise
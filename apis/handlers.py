@@ -1,105 +1,182 @@
-from fastapi import APIRouter, Body
-from fastapi.responses import Response
+from fastapi import APIRouter, Body, Header, HTTPException
+from fastapi.responses import StreamingResponse
 from typing import Optional
-from bson import json_util
-from tools.mongodb_tool import MongoDBTool
+from tools.mongodb_tool import AsyncMongoDBTool
 from tools.external_api_tool import ExternalAPITool
+from tools.mongo_queries import LIST_LIMIT
+from utils.pagination import InvalidPageToken
+from utils.mongo_json import MongoJSONResponse, dumps, parse_fields
 
 router = APIRouter()
-tool = MongoDBTool()
+tool = AsyncMongoDBTool()
 external_tool = ExternalAPITool()
 
-def json_mongo(data):
-    return Response(content=json_util.dumps(data), media_type="application/json")
+def json_mongo(data, fields: Optional[str] = None):
+    return MongoJSONResponse(data, fields=parse_fields(fields))
+
+async def paged(fetch, fields: Optional[str] = None):
+    """Run a list query, turning a bad continuation token into a 400"""
+    try:
+        return json_mongo(await fetch, fields)
+    except InvalidPageToken as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def ndjson(name, *args, fields: Optional[str] = None):
+    """Stream every row of a list query as newline-delimited JSON"""
+    keep = parse_fields(fields)
+    async def lines():
+        async for doc in tool.export(name, *args):
+            yield dumps(doc, keep, newline=True)
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
 # ------------------ Support Agent Test Routes ------------------
 
+# list routes return {"items": [...], "next_token": ...}; send next_token
+# back as page_token for the next page
+
 @router.get("/test/search_clients")
-async def search_clients(name: Optional[str] = None, email: Optional[str] = None, phone: Optional[str] = None):
-    result = tool.search_clients(name=name, email=email, phone=phone)
-    return json_mongo(result)
+async def search_clients(name: Optional[str] = None, email: Optional[str] = None, phone: Optional[str] = None,
+                         limit: int = LIST_LIMIT, page_token: Optional[str] = None, fields: Optional[str] = None):
+    return await paged(tool.search_clients(name=name, email=email, phone=phone, limit=limit, page_token=page_token), fields)
 
 @router.get("/test/orders_by_client")
-async def orders_by_client(client_id: str):
-    result = tool.get_orders_by_client(client_id)
-    return json_mongo(result)
+async def orders_by_client(client_id: str, limit: int = LIST_LIMIT, page_token: Optional[str] = None,
+                           fields: Optional[str] = None):
+    return await paged(tool.get_orders_by_client(client_id, limit=limit, page_token=page_token), fields)
 
 @router.get("/test/order_by_id")
 async def order_by_id(order_id: str):
-    result = tool.get_order_by_id(order_id)
+    result = await tool.get_order_by_id(order_id)
     return json_mongo(result)
 
 @router.get("/test/orders_by_status")
-async def orders_by_status(status: str):
-    result = tool.filter_orders_by_status(status)
-    return json_mongo(result)
+async def orders_by_status(status: str, limit: int = LIST_LIMIT, page_token: Optional[str] = None,
+                           fields: Optional[str] = None):
+    return await paged(tool.filter_orders_by_status(status, limit=limit, page_token=page_token), fields)
 
 @router.get("/test/payment_details")
 async def payment_details(order_id: str):
-    result = tool.get_payment_details(order_id)
+    result = await tool.get_payment_details(order_id)
     return json_mongo(result)
 
 @router.get("/test/pending_dues")
 async def pending_dues(client_id: str):
-    result = tool.calculate_pending_dues(client_id)
+    result = await tool.calculate_pending_dues(client_id)
     return json_mongo(result)
 
 @router.get("/test/upcoming_classes")
-async def upcoming_classes():
-    result = tool.list_upcoming_classes()
-    return json_mongo(result)
+async def upcoming_classes(limit: int = LIST_LIMIT, page_token: Optional[str] = None, fields: Optional[str] = None):
+    return await paged(tool.list_upcoming_classes(limit=limit, page_token=page_token), fields)
 
 @router.get("/test/classes_by_instructor")
-async def classes_by_instructor(instructor: str):
-    result = tool.filter_classes_by_instructor(instructor)
-    return json_mongo(result)
+async def classes_by_instructor(instructor: str, limit: int = LIST_LIMIT, page_token: Optional[str] = None,
+                                fields: Optional[str] = None):
+    return await paged(tool.filter_classes_by_instructor(instructor, limit=limit, page_token=page_token), fields)
+
+# ------------------ NDJSON Export Routes ------------------
+
+@router.get("/export/search_clients")
+async def export_clients(name: Optional[str] = None, email: Optional[str] = None, phone: Optional[str] = None,
+                         fields: Optional[str] = None):
+    return ndjson("search_clients", name, email, phone, fields=fields)
+
+@router.get("/export/orders_by_client")
+async def export_orders_by_client(client_id: str, fields: Optional[str] = None):
+    return ndjson("get_orders_by_client", client_id, fields=fields)
+
+@router.get("/export/orders_by_status")
+async def export_orders_by_status(status: str, fields: Optional[str] = None):
+    return ndjson("filter_orders_by_status", status, fields=fields)
+
+@router.get("/export/upcoming_classes")
+async def export_upcoming_classes(fields: Optional[str] = None):
+    return ndjson("list_upcoming_classes", fields=fields)
+
+@router.get("/export/classes_by_instructor")
+async def export_classes_by_instructor(instructor: str, fields: Optional[str] = None):
+    return ndjson("filter_classes_by_instructor", instructor, fields=fields)
 
 # ------------------ Dashboard Agent Test Routes ------------------
 
+@router.get("/test/metrics")
+async def metrics(names: str):
+    result = await tool.get_metrics(names.split(","))
+    return json_mongo(result)
+
+@router.get("/test/dashboard_kpis")
+async def dashboard_kpis():
+    result = await tool.get_dashboard_kpis()
+    return json_mongo(result)
+
 @router.get("/test/total_revenue")
 async def total_revenue():
-    result = tool.get_total_revenue()
+    result = await tool.get_total_revenue()
+    return json_mongo(result)
+
+@router.get("/test/daily_revenue")
+async def daily_revenue(days: int = 30):
+    result = await tool.get_daily_revenue(days)
     return json_mongo(result)
 
 @router.get("/test/outstanding_payments")
 async def outstanding_payments():
-    result = tool.get_outstanding_payments()
+    result = await tool.get_outstanding_payments()
     return json_mongo(result)
 
 @router.get("/test/client_counts")
 async def client_counts():
-    result = tool.count_active_inactive_clients()
+    result = await tool.count_active_inactive_clients()
     return json_mongo(result)
 
 @router.get("/test/new_clients_this_month")
 async def new_clients_this_month():
-    result = tool.get_new_clients_this_month()
+    result = await tool.get_new_clients_this_month()
     return json_mongo(result)
 
 @router.get("/test/enrollment_trends")
 async def enrollment_trends():
-    result = tool.get_enrollment_trends()
+    result = await tool.get_enrollment_trends()
     return json_mongo(result)
 
 @router.get("/test/top_services")
 async def top_services():
-    result = tool.get_top_services()
+    result = await tool.get_top_services()
     return json_mongo(result)
 
 @router.get("/test/completion_rates")
 async def completion_rates():
-    result = tool.get_course_completion_rates()
+    result = await tool.get_course_completion_rates()
     return json_mongo(result)
 
 @router.get("/test/attendance_percentage")
 async def attendance_percentage(class_name: str):
-    result = tool.get_attendance_percentage(class_name)
+    result = await tool.get_attendance_percentage(class_name)
     return json_mongo(result)
 
 # ------------------ External API Test Routes ------------------
 
 @router.post("/test/create_client_enquiry")
-async def create_client_enquiry(client_data: dict = Body(...)):
-    result = external_tool.create_client_enquiry(client_data)
+async def create_client_enquiry(client_data: dict = Body(...), idempotency_key: Optional[str] = Header(default=None)):
+    result = await external_tool.create_client_enquiry(client_data, idempotency_key)
+    return json_mongo(result)
+
+@router.post("/test/create_order")
+async def create_order(client_id: str = Body(...), service_info: dict = Body(...),
+                       idempotency_key: Optional[str] = Header(default=None)):
+    try:
+        result = await external_tool.create_order(client_id, service_info, idempotency_key)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return json_mongo(result)
+
+# ------------------ Bulk Write Routes ------------------
+
+@router.post("/orders/bulk")
+async def create_orders(orders: list = Body(..., embed=True)):
+    """Front-desk import: many orders in one request, each with an optional idempotency_key"""
+    try:
+        result = await external_tool.create_orders(orders)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     return json_mongo(result)
 
@@ -1,5 +1,7 @@
 import streamlit as st
 import requests
+import json
+import uuid
 
 # Backend URL
 API_BASE = "http://localhost:8000"
@@ -22,6 +24,7 @@ with col2:
 session_id = None
 with st.expander("⚙️ Advanced Options"):
     session_id = st.text_input("Session ID (optional)", placeholder="Enable memory by entering an ID")
+    stream_response = st.checkbox("Stream response", value=True)
 
 
 def display_response(response_data):
@@ -35,21 +38,92 @@ def display_response(response_data):
     st.markdown(f"**{raw}**")
 
 
+def run_job(endpoint, payload, headers):
+    """
+    Queue the query as a background job and long-poll it, so a slow agent
+    run never times out the HTTP request (and a retried submit is not run twice)
+    """
+    headers = {**headers, "Idempotency-Key": uuid.uuid4().hex}
+    for attempt in range(3):
+        try:
+            response = requests.post(f"{API_BASE}{endpoint}/jobs", json=payload, headers=headers, timeout=10)
+            break
+        except requests.exceptions.Timeout:
+            if attempt == 2:
+                raise
+    response.raise_for_status()
+    job = response.json()
+    with st.spinner("Agent is working..."):
+        while job["status"] not in ("done", "failed"):
+            response = requests.get(f"{API_BASE}/jobs/{job['job_id']}", params={"wait": 20}, timeout=30)
+            response.raise_for_status()
+            job = response.json()
+    return job
+
+
+def sse_events(response):
+    """Parse a text/event-stream response into (event, data) pairs"""
+    event, data = "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if not line:
+            if data:
+                yield event, json.loads("\n".join(data))
+            event, data = "message", []
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data.append(line[len("data:"):].strip())
+
+
+def stream_response_view(response):
+    """Render tool activity and LLM tokens as they arrive, then the final answer"""
+    st.markdown("### 🤖 Agent Response")
+    status = st.empty()
+    body = st.empty()
+    tokens = ""
+    for event, data in sse_events(response):
+        if event == "start":
+            status.info("Thinking...")
+        elif event == "tool_start":
+            status.info(f"🔧 Running {data['tool']}...")
+        elif event == "tool_end":
+            status.info(f"✅ {data['tool']} finished")
+        elif event == "tool_error":
+            status.warning(f"⚠️ {data['tool']} failed: {data['error']}")
+        elif event == "token":
+            tokens += data["text"]
+            body.markdown(tokens)
+        elif event == "reset":
+            tokens = ""
+            body.empty()
+        elif event == "result":
+            status.empty()
+            body.markdown(f"**{data['raw']}**")
+        elif event == "error":
+            status.empty()
+            st.error(data["detail"])
+
+
 if st.button("Submit"):
     if not user_query:
         st.warning("Please enter a query.")
     else:
         endpoint = "/support/query" if agent_choice == "Support Agent" else "/dashboard/query"
         payload = {"prompt": user_query}
-        if session_id:
-            payload["session_id"] = session_id
+        headers = {"session-id": session_id} if session_id else {}
 
         try:
-            response = requests.post(f"{API_BASE}{endpoint}", json=payload)
-            if response.status_code == 200:
-                result = response.json()
-                display_response(result.get("response", {}))
+            if stream_response:
+                response = requests.post(f"{API_BASE}{endpoint}/stream", json=payload, headers=headers, stream=True)
+                if response.status_code != 200:
+                    st.error(f"Error {response.status_code}: {response.text}")
+                else:
+                    stream_response_view(response)
             else:
-                st.error(f"Error {response.status_code}: {response.text}")
+                job = run_job(endpoint.rsplit("/", 1)[0], payload, headers)
+                if job["status"] == "failed":
+                    st.error(job["error"])
+                else:
+                    display_response({"raw": job["result"]})
         except requests.exceptions.RequestException as e:
             st.error(f"Connection error: {e}")
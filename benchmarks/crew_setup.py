@@ -0,0 +1,55 @@
+"""
+Per-request crew setup cost: building a fresh Task + Crew (and Agent) per
+request, as the agents used to, versus leasing a pre-built crew from the
+pool. Both sides run a full public crew.kickoff(inputs=...), so the
+difference is the setup the pool saves.
+
+    python benchmarks/crew_setup.py [iterations]
+
+Runs with LLM_BACKEND=fake and no simulated latency. The prompt matches no
+tool, so each kickoff is a single scripted LLM reply and never reaches
+Mongo. Crew output is discarded.
+"""
+import contextlib
+import os
+import sys
+import time
+import tracemalloc
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["LLM_BACKEND"] = "fake"
+os.environ["FAKE_LLM_LATENCY_MS"] = "0"
+os.environ["FAKE_LLM_JITTER_MS"] = "0"
+
+from agents import dashboard_agent, support_agent
+
+# no FakeLLM script entry matches, so the agent answers without a tool call
+INPUTS = {"query": "\n\nNew Query: hello there"}
+
+
+def measure(label, fn, iterations):
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        fn()  # warm up imports and caches
+        tracemalloc.start()
+        started = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    print(f"{label:<34} {elapsed / iterations * 1000:8.3f} ms/request   peak alloc {peak / 1024:8.1f} KiB")
+
+
+def rebuild(build):
+    return lambda: build().kickoff(inputs=INPUTS)
+
+
+def pooled(pool):
+    return lambda: pool.lease(INPUTS).kickoff()
+
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    measure("support: build crew per request", rebuild(support_agent.build_support_crew), iterations)
+    measure("support: pooled crew", pooled(support_agent.support_crews), iterations)
+    measure("dashboard: build crew per request", rebuild(dashboard_agent.build_dashboard_crew), iterations)
+    measure("dashboard: pooled crew", pooled(dashboard_agent.dashboard_crews), iterations)
@@ -0,0 +1,43 @@
+"""
+Sanity check for LLM_BACKEND=fake: a support and a dashboard crew driven by
+FakeLLM must call a tool before answering. If they answer straight away,
+load_test.py only measures the fake's sleep and never reaches the tools or
+Mongo.
+
+    python benchmarks/fake_crew_check.py
+
+The tools do not need Mongo to be up (they turn errors into text), so this
+only checks the ReAct loop. Exits non-zero if a crew answered without a tool.
+"""
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["LLM_BACKEND"] = "fake"
+os.environ.setdefault("FAKE_LLM_LATENCY_MS", "0")
+os.environ.setdefault("FAKE_LLM_JITTER_MS", "0")
+os.environ.setdefault("MONGO_SERVER_SELECTION_TIMEOUT_MS", "500")
+
+from crewai.utilities.events import crewai_event_bus, ToolUsageStartedEvent
+from agents import dashboard_agent, support_agent
+
+CASES = [
+    ("support", support_agent.build_support_crew, "Show upcoming classes this week", "List Upcoming Classes"),
+    ("dashboard", dashboard_agent.build_dashboard_crew, "What is our total revenue?", "Get Total Revenue"),
+]
+
+tools_used = []
+
+@crewai_event_bus.on(ToolUsageStartedEvent)
+def _on_tool_started(source, event):
+    tools_used.append(event.tool_name)
+
+
+if __name__ == "__main__":
+    failed = False
+    for label, build, prompt, expected in CASES:
+        tools_used.clear()
+        result = build().kickoff(inputs={"query": f"\n\nNew Query: {prompt}"})
+        ok = expected in tools_used and "the result of the action" not in result.raw
+        failed |= not ok
+        print(f"{'OK' if ok else 'FAIL':<6} {label}: tools={tools_used or 'none'} answer={result.raw[:80]!r}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,83 @@
+"""
+Cold-start budget for the API process: how long `import main` takes in a
+fresh interpreter, and which modules it pulls in.
+
+    python benchmarks/import_time.py [--runs 5] [--budget-ms 1500] [--top 15]
+
+Each run is a new python process without GOOGLE_API_KEY, so it also checks
+that the app imports without LLM credentials. CrewAI and litellm must stay
+out of the import (they load with the agents, on first use or at warm-up).
+Exits non-zero if the median import time is over budget or a deferred
+module was imported.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFERRED = ("crewai", "litellm")
+
+PROBE = """
+import sys, time
+started = time.perf_counter()
+import main
+print((time.perf_counter() - started) * 1000)
+print(",".join(sorted({name.split(".")[0] for name in sys.modules})))
+"""
+
+
+def environment():
+    env = {k: v for k, v in os.environ.items() if k != "GOOGLE_API_KEY"}
+    # load_dotenv() never overrides variables that are already set
+    env["GOOGLE_API_KEY"] = ""
+    return env
+
+def probe():
+    """(milliseconds, top-level modules loaded) for one fresh import of main"""
+    out = subprocess.run([sys.executable, "-c", PROBE], cwd=ROOT, env=environment(),
+                         capture_output=True, text=True, check=True).stdout.split("\n")
+    return float(out[0]), set(out[1].split(","))
+
+def heaviest(top: int):
+    """Top-level packages by cumulative import time, from python -X importtime"""
+    err = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=ROOT,
+                         env=environment(), capture_output=True, text=True, check=True).stderr
+    packages = {}
+    for line in err.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # top-level entries are the ones imported without indentation
+        if not name.startswith("  "):
+            packages[name.strip()] = int(cumulative) / 1000
+    return sorted(packages.items(), key=lambda item: -item[1])[:top]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=1500)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    timings, modules = [], set()
+    for _ in range(args.runs):
+        ms, loaded = probe()
+        timings.append(ms)
+        modules |= loaded
+
+    median = statistics.median(timings)
+    print(f"import main: median {median:.0f} ms, min {min(timings):.0f} ms, max {max(timings):.0f} ms "
+          f"over {args.runs} runs (budget {args.budget_ms:.0f} ms)")
+    print("\nheaviest imports (cumulative ms):")
+    for name, ms in heaviest(args.top):
+        print(f"  {name:<40} {ms:>8.1f}")
+
+    leaked = [name for name in DEFERRED if name in modules]
+    if leaked:
+        print(f"\nFAIL: imported at startup, should be deferred: {', '.join(leaked)}")
+    if median > args.budget_ms:
+        print(f"\nFAIL: over budget by {median - args.budget_ms:.0f} ms")
+    sys.exit(1 if leaked or median > args.budget_ms else 0)
@@ -0,0 +1,81 @@
+"""
+Response encoding cost: bson.json_util.dumps (what apis/handlers.py used)
+versus utils.mongo_json.dumps (orjson), on orders and classes payloads
+shaped like the seeded collections, as full documents with ObjectId _ids.
+
+    python benchmarks/json_encoding.py [iterations]
+
+No database is needed; payloads are built in memory.
+"""
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId, json_util
+from utils import mongo_json
+
+SIZES = (20, 1_000, 10_000)
+
+
+def order(i):
+    order_date = datetime(2025, 1, 1) + timedelta(minutes=random.randint(0, 260_000))
+    return {
+        "_id": ObjectId(),
+        "order_id": f"ORDER_{i:05d}",
+        "client_id": f"CLIENT_{random.randint(1, 5000):04d}",
+        "service_id": f"COURSE_{random.randint(1, 10):03d}",
+        "service_type": random.choice(["course", "class"]),
+        "service_name": random.choice(["Yoga Beginner", "HIIT Training", "Morning Yoga", "Evening Pilates"]),
+        "amount": random.randint(500, 8000),
+        "status": random.choice(["paid", "pending", "cancelled"]),
+        "order_date": order_date,
+        "due_date": order_date + timedelta(days=7),
+    }
+
+def klass(i):
+    return {
+        "_id": ObjectId(),
+        "class_id": f"CLASS_{i:04d}",
+        "name": random.choice(["Morning Yoga", "Evening Pilates", "HIIT Workout", "Cardio Burn"]),
+        "instructor": random.choice(["Sarah Johnson", "Mike Chen", "Priya Sharma"]),
+        "instructor_tokens": ["sarah", "johnson"],
+        "date": datetime(2025, 6, 1) + timedelta(hours=random.randint(0, 2000)),
+        "duration_minutes": random.choice([45, 60, 90]),
+        "max_students": random.randint(8, 20),
+        "enrolled_students": [f"CLIENT_{random.randint(1, 5000):04d}" for _ in range(random.randint(3, 15))],
+        "status": random.choice(["scheduled", "ongoing", "completed"]),
+        "price": random.randint(500, 1500),
+    }
+
+
+def measure(encode, payload, iterations):
+    encode(payload)  # warm up
+    started = time.perf_counter()
+    for _ in range(iterations):
+        size = len(encode(payload))
+    elapsed = (time.perf_counter() - started) / iterations
+    tracemalloc.start()
+    encode(payload)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, size, peak
+
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    random.seed(7)
+    print(f"{'payload':<16} {'encoder':<16} {'ms/call':>9} {'MB/s':>8} {'peak KiB':>10} {'speedup':>8}")
+    for name, build in (("orders", order), ("classes", klass)):
+        for size in SIZES:
+            payload = [build(i + 1) for i in range(size)]
+            runs = max(1, iterations * 1000 // size)
+            base, base_bytes, base_peak = measure(json_util.dumps, payload, runs)
+            fast, fast_bytes, fast_peak = measure(mongo_json.dumps, payload, runs)
+            label = f"{name} x{size}"
+            print(f"{label:<16} {'json_util':<16} {base * 1000:>9.3f} {base_bytes / base / 1e6:>8.1f} {base_peak / 1024:>10.1f}")
+            print(f"{'':<16} {'mongo_json':<16} {fast * 1000:>9.3f} {fast_bytes / fast / 1e6:>8.1f} "
+                  f"{fast_peak / 1024:>10.1f} {base / fast:>7.1f}x")
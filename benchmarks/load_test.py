@@ -0,0 +1,149 @@
+"""
+End-to-end load test against a running backend.
+
+    LLM_BACKEND=fake uvicorn main:app            # offline LLM, local Mongo
+    python benchmarks/load_test.py [--url URL] [--concurrency N] [--requests N]
+                                   [--targets support,dashboard,test]
+
+Each target is driven with N requests at the given concurrency; prompts
+and /test/* paths rotate through fixed lists so runs are repeatable. The
+report has latency percentiles and throughput per target, then the
+server's per-stage timings (GET /stages/stats) accumulated during the run.
+Use distinct session ids and prompts per run, or restart the server, if the
+response cache should not absorb repeats.
+"""
+import argparse
+import asyncio
+import itertools
+import time
+import uuid
+import httpx
+
+SUPPORT_PROMPTS = [
+    "Show upcoming classes this week",
+    "Find client John",
+    "What is the payment status for order ORDER_00001?",
+    "List all pending orders",
+    "Which classes does instructor Sarah teach?",
+    "How much does client CLIENT_0001 owe?",
+]
+
+DASHBOARD_PROMPTS = [
+    "Give me a dashboard overview of the studio",
+    "Show daily revenue for the last month",
+    "Which services are the best earners and how is enrollment trending?",
+    "How many active clients do we have compared to last month?",
+    "What is the attendance percentage for Yoga?",
+    "Summarize course completion rates",
+]
+
+TEST_PATHS = [
+    "/test/search_clients?name=jo",
+    "/test/orders_by_status?status=pending",
+    "/test/upcoming_classes",
+    "/test/dashboard_kpis",
+    "/test/total_revenue",
+    "/test/daily_revenue?days=30",
+    "/test/client_counts",
+    "/test/top_services",
+    "/test/metrics?names=total_revenue,outstanding_payments,client_counts",
+]
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def requests_for(target, run_id):
+    if target == "test":
+        return (("GET", path, None, None) for path in itertools.cycle(TEST_PATHS))
+    prompts = SUPPORT_PROMPTS if target == "support" else DASHBOARD_PROMPTS
+    # a fresh session per request keeps memory from growing across the run
+    return (
+        ("POST", f"/{target}/query", {"prompt": prompt}, {"session-id": f"load-{run_id}-{i}"})
+        for i, prompt in enumerate(itertools.cycle(prompts))
+    )
+
+
+async def drive(client, target, total, concurrency, run_id):
+    plan = itertools.islice(requests_for(target, run_id), total)
+    latencies, errors = [], 0
+    lock = asyncio.Lock()
+
+    async def worker():
+        nonlocal errors
+        while True:
+            async with lock:
+                request = next(plan, None)
+            if request is None:
+                return
+            method, path, body, headers = request
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=body, headers=headers)
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            elapsed = time.perf_counter() - started
+            if ok:
+                latencies.append(elapsed)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "ok": len(latencies),
+        "errors": errors,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "rps": len(latencies) / wall if wall else 0.0,
+    }
+
+
+def stage_delta(before, after):
+    delta = {}
+    for name, now in after.items():
+        prev = before.get(name, {"count": 0, "total_ms": 0.0})
+        count = now["count"] - prev["count"]
+        if count:
+            total = now["total_ms"] - prev["total_ms"]
+            delta[name] = (count, total, total / count)
+    return delta
+
+
+async def main(args):
+    run_id = uuid.uuid4().hex[:8]
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout) as client:
+        before = (await client.get("/stages/stats")).json()
+
+        print(f"{'target':<10} {'ok':>6} {'err':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>8}")
+        for target in args.targets.split(","):
+            r = await drive(client, target, args.requests, args.concurrency, run_id)
+            print(f"{target:<10} {r['ok']:>6} {r['errors']:>5} {r['p50'] * 1000:>9.1f} "
+                  f"{r['p95'] * 1000:>9.1f} {r['p99'] * 1000:>9.1f} {r['rps']:>8.2f}")
+
+        after = (await client.get("/stages/stats")).json()
+
+    delta = stage_delta(before, after)
+    print(f"\n{'stage':<14} {'count':>7} {'total ms':>11} {'avg ms':>9}")
+    for name, (count, total, avg) in sorted(delta.items()):
+        print(f"{name:<14} {count:>7} {total:>11.1f} {avg:>9.2f}")
+    if "crew" in delta and "tools" not in delta:
+        print("\nWARNING: crews ran but no tool was called; agent timings exclude the tools and Mongo")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=50, help="requests per target")
+    parser.add_argument("--targets", default="support,dashboard,test")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    asyncio.run(main(parser.parse_args()))
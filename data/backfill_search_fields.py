@@ -0,0 +1,38 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo import UpdateOne
+from models.database import get_sync_collection, test_connection, ensure_indexes
+from utils.search import client_search_fields, class_search_fields
+
+BATCH_SIZE = 1000
+
+
+def backfill(collection_name, fields_fn, projection):
+    """Recompute the normalized search fields on every document of a collection"""
+    collection = get_sync_collection(collection_name)
+    updated = 0
+    batch = []
+    for doc in collection.find({}, projection):
+        batch.append(UpdateOne({"_id": doc["_id"]}, {"$set": fields_fn(doc)}))
+        if len(batch) >= BATCH_SIZE:
+            updated += collection.bulk_write(batch, ordered=False).modified_count
+            batch = []
+    if batch:
+        updated += collection.bulk_write(batch, ordered=False).modified_count
+    print(f"Updated search fields on {updated} {collection_name}")
+
+
+def backfill_search_fields():
+    """Add search fields to data seeded before they existed"""
+    if not test_connection():
+        return False
+    backfill("clients", client_search_fields, {"name": 1, "email": 1, "phone": 1})
+    backfill("classes", class_search_fields, {"instructor": 1})
+    ensure_indexes()
+    return True
+
+
+if __name__ == "__main__":
+    backfill_search_fields()
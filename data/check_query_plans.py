@@ -0,0 +1,103 @@
+import sys
+import os
+from datetime import datetime
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.database import sync_db, test_connection
+from tools import mongo_queries as q
+
+# sample arguments; the winning plan only depends on the query shape
+SAMPLE_CLIENT_ID = "CLIENT_0001"
+SAMPLE_ORDER_ID = "ORDER_00001"
+
+# (label, collection, filter, sort) for every find/find_one/count in MongoDBTool,
+# every lookup/update filter on ExternalAPITool's write path and the job queue's lookups
+FIND_QUERIES = [
+    ("search_clients (name)", "clients", q.search_clients(name="john"), q.CLIENTS_SORT),
+    ("search_clients (email)", "clients", q.search_clients(email="john@"), q.CLIENTS_SORT),
+    ("search_clients (phone)", "clients", q.search_clients(phone="555"), q.CLIENTS_SORT),
+    ("get_orders_by_client", "orders", q.orders_by_client(SAMPLE_CLIENT_ID), q.ORDERS_SORT),
+    ("get_order_by_id", "orders", q.order_by_id(SAMPLE_ORDER_ID), None),
+    ("filter_orders_by_status", "orders", q.orders_by_status("pending"), q.ORDERS_SORT),
+    ("get_payment_details", "payments", q.payment_by_order(SAMPLE_ORDER_ID), None),
+    ("calculate_pending_dues", "orders", q.pending_orders_by_client(SAMPLE_CLIENT_ID), None),
+    ("list_upcoming_classes", "classes", q.upcoming_classes(), q.UPCOMING_CLASSES_SORT),
+    ("filter_classes_by_instructor", "classes", q.classes_by_instructor("sarah"), q.CLASSES_SORT),
+    ("create_orders (idempotency)", "orders", q.by_idempotency_keys(["sample-key"]), None),
+    ("create_client_enquiry (idempotency)", "clients", q.by_idempotency_keys(["sample-key"]), None),
+    ("create_orders (client enrollment)", "clients", q.client_by_id(SAMPLE_CLIENT_ID), None),
+    ("create_orders (course enrollment)", "courses", q.course_by_id("COURSE_001"), None),
+    ("job claim", "agent_jobs", q.claimable_jobs([0, 1, 2]), q.JOB_CLAIM_SORT),
+    ("job session head", "agent_jobs", q.unfinished_jobs("default_user"), q.JOB_SEQ_SORT),
+    ("job lease expiry", "agent_jobs", q.expired_job_leases(datetime.utcnow()), None),
+    ("job unsequenced", "agent_jobs", q.unsequenced_jobs(datetime.utcnow()), None),
+    ("job submit (idempotency)", "agent_jobs", q.by_idempotency_keys(["sample-key"]), None),
+    ("get_total_revenue", "rollup_totals", q.totals_filter(), None),
+    ("get_new_clients_this_month", "rollup_monthly_clients", q.current_month_filter(), None),
+    ("get_daily_revenue", "rollup_daily_revenue", q.daily_revenue_filter(30), q.DAILY_REVENUE_SORT),
+    ("get_attendance_percentage (rollup)", "rollup_class_attendance", q.class_attendance_filter("Morning Yoga"), None),
+    ("get_attendance_percentage (class)", "classes", q.class_by_name("Morning Yoga"), None),
+]
+
+# (label, collection, pipeline, full_scan) for every aggregate in MongoDBTool;
+# full_scan marks pipelines over collections that stay small by design
+# (one rollup doc per service/class, a handful of courses)
+AGGREGATE_QUERIES = [
+    ("get_dashboard_kpis", "rollup_totals", q.kpi_pipeline(), True),
+    ("get_enrollment_trends", "rollup_services", q.enrollment_trends_pipeline(), True),
+    ("get_top_services", "rollup_services", q.top_services_pipeline(), True),
+    ("get_course_completion_rates", "courses", q.course_completion_pipeline(), True),
+]
+
+
+def winning_stages(node, in_winning=False):
+    """Yield every stage name inside the winningPlan subtrees of an explain document"""
+    if isinstance(node, dict):
+        if in_winning and "stage" in node:
+            yield node["stage"]
+        for key, value in node.items():
+            yield from winning_stages(value, in_winning or key == "winningPlan")
+    elif isinstance(node, list):
+        for item in node:
+            yield from winning_stages(item, in_winning)
+
+
+def explain_find(collection, query, sort=None):
+    cursor = sync_db[collection].find(query)
+    if sort:
+        cursor = cursor.sort(sort)
+    return cursor.explain()
+
+
+def explain_aggregate(collection, pipeline):
+    return sync_db.command("aggregate", collection, pipeline=pipeline, explain=True)
+
+
+def check_query_plans():
+    """Explain every MongoDBTool query and fail if any of them does a COLLSCAN"""
+    if not test_connection():
+        return False
+
+    failures = []
+    plans = [(label, explain_find(coll, query, sort), False) for label, coll, query, sort in FIND_QUERIES]
+    plans += [(label, explain_aggregate(coll, pipeline), full_scan) for label, coll, pipeline, full_scan in AGGREGATE_QUERIES]
+
+    for label, explain, full_scan in plans:
+        stages = set(winning_stages(explain))
+        if "COLLSCAN" not in stages:
+            print(f"OK        {label}: {', '.join(sorted(stages))}")
+        elif full_scan:
+            print(f"ALLOWED   {label}: scan of a small, bounded collection")
+        else:
+            print(f"COLLSCAN  {label}")
+            failures.append(label)
+
+    if failures:
+        print(f"{len(failures)} queries still do a collection scan: {', '.join(failures)}")
+        return False
+    print("All queries use an index.")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if check_query_plans() else 1)
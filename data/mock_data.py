@@ -3,118 +3,115 @@ import random
 from datetime import datetime, timedelta
 from models.schemas import *
 import uuid
+from utils.search import client_search_fields, class_search_fields
 
 fake = Faker()
 
-def generate_clients(count=100):
-    """Generate realistic client data"""
-    clients = []
+CLASS_NAMES = [
+    "Morning Yoga", "Evening Pilates", "HIIT Workout", "Strength Session",
+    "Cardio Burn", "Meditation Class", "Dance Party", "CrossFit WOD"
+]
+
+COURSE_NAMES = [
+    "Yoga Beginner", "Yoga Advanced", "Pilates Fundamentals",
+    "HIIT Training", "Strength Training", "Cardio Blast",
+    "Meditation & Mindfulness", "Dance Fitness", "CrossFit", "Zumba"
+]
+
+INSTRUCTORS = [
+    "Sarah Johnson", "Mike Chen", "Priya Sharma", "David Wilson",
+    "Lisa Rodriguez", "James Kumar", "Emily Davis", "Alex Thompson"
+]
+
+PAYMENT_METHODS = ["card", "cash", "upi", "bank_transfer"]
+
+
+def client_id(n):
+    return f"CLIENT_{n:04d}"
+
+def random_datetime(start: timedelta, end: timedelta):
+    """Uniform datetime between now+start and now+end; much cheaper than Faker's"""
+    # naive UTC like every stored datetime; the API labels naive values as UTC
+    now = datetime.utcnow()
+    return now + start + (end - start) * random.random()
+
+
+#streaming generators: each yields one document at a time, so callers can
+#batch them without holding a whole collection in memory
+
+def iter_clients(count=100):
+    """Yield realistic client documents CLIENT_0001..CLIENT_<count>"""
     for i in range(count):
         client = {
-            "client_id": f"CLIENT_{i+1:04d}",
+            "client_id": client_id(i + 1),
             "name": fake.name(),
             "email": fake.email(),
             "phone": fake.phone_number()[:15],
             "enrolled_services": [],
             "status": random.choice(["active", "inactive"]),
-            "registration_date": fake.date_time_between(start_date='-2y', end_date='now'),
-            'birthday': fake.date_time_between(start_date='-80y', end_date='-18y'),
+            "registration_date": random_datetime(timedelta(days=-730), timedelta(0)),
+            'birthday': random_datetime(timedelta(days=-80 * 365), timedelta(days=-18 * 365)),
             "address": fake.address()
         }
-        clients.append(client)
-    return clients
+        client.update(client_search_fields(client))
+        yield client
 
-def generate_courses(count=10):
-    """Generate course data"""
-    course_names = [
-        "Yoga Beginner", "Yoga Advanced", "Pilates Fundamentals", 
-        "HIIT Training", "Strength Training", "Cardio Blast",
-        "Meditation & Mindfulness", "Dance Fitness", "CrossFit", "Zumba"
-    ]
-    
-    instructors = [
-        "Sarah Johnson", "Mike Chen", "Priya Sharma", "David Wilson",
-        "Lisa Rodriguez", "James Kumar", "Emily Davis", "Alex Thompson"
-    ]
-    
-    courses = []
-    for i, name in enumerate(course_names):
-        course = {
+def iter_courses(count=10):
+    """Yield course documents; names repeat with a numeric suffix past the catalogue"""
+    for i in range(count):
+        name = COURSE_NAMES[i % len(COURSE_NAMES)]
+        if i >= len(COURSE_NAMES):
+            name = f"{name} {i // len(COURSE_NAMES) + 1}"
+        yield {
             "course_id": f"COURSE_{i+1:03d}",
             "name": name,
             "description": f"Professional {name.lower()} training program",
-            "instructor": random.choice(instructors),
+            "instructor": random.choice(INSTRUCTORS),
             "duration_weeks": random.randint(4, 12),
             "price": random.randint(2000, 8000),
             "max_students": random.randint(10, 25),
             "enrolled_count": random.randint(5, 20),
-            "start_date": fake.date_time_between(start_date='-1y', end_date='+3m'),
-            "end_date": fake.date_time_between(start_date='+3m', end_date='+1y'),
+            "start_date": random_datetime(timedelta(days=-365), timedelta(days=90)),
+            "end_date": random_datetime(timedelta(days=90), timedelta(days=365)),
             "status": "active"
         }
-        courses.append(course)
-    return courses
 
-def generate_classes(count=50):
-    """Generate class data"""
-    class_names = [
-        "Morning Yoga", "Evening Pilates", "HIIT Workout", "Strength Session",
-        "Cardio Burn", "Meditation Class", "Dance Party", "CrossFit WOD"
-    ]
-    
-    instructors = [
-        "Sarah Johnson", "Mike Chen", "Priya Sharma", "David Wilson",
-        "Lisa Rodriguez", "James Kumar", "Emily Davis", "Alex Thompson"
-    ]
-    
-    classes = []
+def iter_classes(count=50, client_count=100):
+    """Yield class documents whose enrolled_students are existing client IDs"""
     for i in range(count):
-        class_date = fake.date_time_between(start_date='-1m', end_date='+1m')
         class_obj = {
             "class_id": f"CLASS_{i+1:04d}",
-            "name": random.choice(class_names),
-            "instructor": random.choice(instructors),
-            "date": class_date,
+            "name": random.choice(CLASS_NAMES),
+            "instructor": random.choice(INSTRUCTORS),
+            "date": random_datetime(timedelta(days=-30), timedelta(days=30)),
             "duration_minutes": random.choice([45, 60, 90]),
             "max_students": random.randint(8, 20),
-            "enrolled_students": [f"CLIENT_{random.randint(1, 100):04d}" for _ in range(random.randint(3, 15))],
+            "enrolled_students": [client_id(n) for n in
+                                  random.sample(range(1, client_count + 1), min(random.randint(3, 15), client_count))],
             "status": random.choice(["scheduled", "ongoing", "completed"]),
             "price": random.randint(500, 1500)
         }
-        classes.append(class_obj)
-    return classes
+        class_obj.update(class_search_fields(class_obj))
+        yield class_obj
 
-def generate_orders(clients, courses, classes, count=200):
-    """Generate order data"""
-    orders = []
-    all_services = []
-    
-    # Add courses as services
-    for course in courses:
-        all_services.append({
-            "id": course["course_id"],
-            "name": course["name"],
-            "type": "course",
-            "price": course["price"]
-        })
-    
-    
-    for class_obj in classes:
-        all_services.append({
-            "id": class_obj["class_id"],
-            "name": class_obj["name"],
-            "type": "class",
-            "price": class_obj["price"]
-        })
-    
+def services_from(courses, classes):
+    """Orderable services: the summary of each course and class an order references"""
+    services = [{"id": c["course_id"], "name": c["name"], "type": "course", "price": c["price"]} for c in courses]
+    services += [{"id": c["class_id"], "name": c["name"], "type": "class", "price": c["price"]} for c in classes]
+    return services
+
+def iter_orders_and_payments(client_count, services, count=200):
+    """
+    Yield (order, payment) pairs; payment is None unless the order is paid.
+    Orders reference clients by number, so the client documents need not be
+    in memory.
+    """
     for i in range(count):
-        client = random.choice(clients)
-        service = random.choice(all_services)
-        order_date = fake.date_time_between(start_date='-6m', end_date='now')
-        
+        service = random.choice(services)
+        order_date = random_datetime(timedelta(days=-182), timedelta(0))
         order = {
             "order_id": f"ORDER_{i+1:05d}",
-            "client_id": client["client_id"],
+            "client_id": client_id(random.randint(1, client_count)),
             "service_id": service["id"],
             "service_type": service["type"],
             "service_name": service["name"],
@@ -123,48 +120,70 @@ def generate_orders(clients, courses, classes, count=200):
             "order_date": order_date,
             "due_date": order_date + timedelta(days=7)
         }
-        orders.append(order)
-    return orders
+        payment = None
+        if order["status"] == "paid":
+            payment = {
+                "payment_id": f"PAY_{i+1:05d}",
+                "order_id": order["order_id"],
+                "client_id": order["client_id"],
+                "amount": order["amount"],
+                "payment_date": order_date + timedelta(days=random.randint(0, 5)),
+                "payment_method": random.choice(PAYMENT_METHODS),
+                "transaction_id": f"TXN_{uuid.uuid4().hex[:10].upper()}"
+            }
+        yield order, payment
+
+def iter_attendance(classes):
+    """Yield attendance records for the enrolled students of completed classes"""
+    attendance_id = 1
+    for class_obj in classes:
+        if class_obj["status"] != "completed":
+            continue
+        for student_id in class_obj["enrolled_students"]:
+            yield {
+                "attendance_id": f"ATT_{attendance_id:05d}",
+                "class_id": class_obj["class_id"],
+                "client_id": student_id,
+                "date": class_obj["date"],
+                "attended": random.choice([True, True, True, False]),  # 75% attendance rate
+                "notes": fake.sentence() if random.random() < 0.1 else None
+            }
+            attendance_id += 1
+
+
+#list helpers for small, in-memory datasets
+
+def generate_clients(count=100):
+    """Generate realistic client data"""
+    return list(iter_clients(count))
+
+def generate_courses(count=10):
+    """Generate course data"""
+    return list(iter_courses(count))
+
+def generate_classes(count=50, client_count=100):
+    """Generate class data"""
+    return list(iter_classes(count, client_count))
+
+def generate_orders(clients, courses, classes, count=200):
+    """Generate order data"""
+    return [order for order, _ in iter_orders_and_payments(len(clients), services_from(courses, classes), count)]
 
 def generate_payments(orders):
     """Generate payment data for paid orders"""
     payments = []
-    payment_methods = ["card", "cash", "upi", "bank_transfer"]
-    
-    paid_orders = [order for order in orders if order["status"] == "paid"]
-    
-    for i, order in enumerate(paid_orders):
-        payment = {
+    for i, order in enumerate(o for o in orders if o["status"] == "paid"):
+        payments.append({
             "payment_id": f"PAY_{i+1:05d}",
             "order_id": order["order_id"],
             "client_id": order["client_id"],
             "amount": order["amount"],
             "payment_date": order["order_date"] + timedelta(days=random.randint(0, 5)),
-            "payment_method": random.choice(payment_methods),
+            "payment_method": random.choice(PAYMENT_METHODS),
             "transaction_id": f"TXN_{uuid.uuid4().hex[:10].upper()}"
-        }
-        payments.append(payment)
+        })
     return payments
 
 def generate_attendance(classes, clients):
     """Generate attendance data"""
-    attendance_records = []
-    attendance_id = 1
-    
-    for class_obj in classes:
-        if class_obj["status"] == "completed":
-            for student_id in class_obj["enrolled_students"]:
-                attendance = {
-                    "attendance_id": f"ATT_{attendance_id:05d}",
-                    "class_id": class_obj["class_id"],
-                    "client_id": student_id,
-                    "date": class_obj["date"],
-                    "attended": random.choice([True, True, True, False]),  # 75% attendance rate
-                    "notes": fake.sentence() if random.random() < 0.1 else None
-                }
-                attendance_records.append(attendance)
-                attendance_id += 1
-    
-    return attendance_records
-
-
+    return list(iter_attendance(classes))
@@ -0,0 +1,23 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.database import sync_db, test_connection
+from tools.rollups import rebuild_rollups, ROLLUP_COLLECTIONS
+
+
+def rebuild():
+    """Recompute every dashboard rollup from the raw collections"""
+    if not test_connection():
+        return False
+
+    print("Rebuilding rollups...")
+    rebuild_rollups(sync_db)
+    for name in ROLLUP_COLLECTIONS:
+        print(f"{name}: {sync_db[name].estimated_document_count()} documents")
+    print("Rollups rebuilt!")
+    return True
+
+
+if __name__ == "__main__":
+    rebuild()
@@ -1,48 +1,158 @@
+"""
+Seed the database with mock data at a chosen scale.
+
+    python data/seed_database.py [--preset demo|1k|100k|10m] [--batch-size N] [--workers N]
+
+Documents are generated lazily and written in fixed-size batches with
+unordered insert_many calls spread over a thread pool. At most two
+batches per worker are in flight, so memory stays flat however many
+orders are generated. Only courses and classes (small, and needed to
+build orders and attendance) are kept in memory. Every generated datetime
+is naive UTC (see random_datetime), which the API serializes as UTC.
+"""
+import argparse
+import itertools
 import sys
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from models.database import get_sync_collection, test_connection
+from pymongo.errors import BulkWriteError
+from models.database import sync_db, get_sync_collection, test_connection, ensure_indexes
+from tools.rollups import rebuild_rollups
 from mock_data import *
 
-def seed_database():
+# sizes per preset; named after the number of orders
+PRESETS = {
+    "demo": {"clients": 50, "courses": 10, "classes": 25, "orders": 100},
+    "1k": {"clients": 200, "courses": 10, "classes": 50, "orders": 1_000},
+    "100k": {"clients": 10_000, "courses": 20, "classes": 1_000, "orders": 100_000},
+    "10m": {"clients": 500_000, "courses": 50, "classes": 20_000, "orders": 10_000_000},
+}
+
+SEED_BATCH_SIZE = int(os.getenv("SEED_BATCH_SIZE", "1000"))
+SEED_WORKERS = int(os.getenv("SEED_WORKERS", "4"))
+
+
+class BulkLoader:
+    """Writes batches on a thread pool with a bounded number in flight."""
+
+    def __init__(self, workers: int = SEED_WORKERS, batch_size: int = SEED_BATCH_SIZE):
+        self.batch_size = batch_size
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="seed")
+        self.slots = threading.BoundedSemaphore(workers * 2)
+        self.lock = threading.Lock()
+        self.inserted = {}
+        self.errors = 0
+
+    def submit(self, collection_name, batch):
+        self.slots.acquire()
+        return self.executor.submit(self._insert, collection_name, batch)
+
+    def _insert(self, collection_name, batch):
+        try:
+            inserted = len(batch)
+            try:
+                get_sync_collection(collection_name).insert_many(batch, ordered=False)
+            except BulkWriteError as e:
+                inserted = e.details.get("nInserted", 0)
+                with self.lock:
+                    self.errors += len(e.details.get("writeErrors", []))
+            with self.lock:
+                self.inserted[collection_name] = self.inserted.get(collection_name, 0) + inserted
+        finally:
+            self.slots.release()
+
+    def load(self, docs_by_collection):
+        """
+        Stream (collection_name, doc) pairs into per-collection batches and
+        wait until all of them are written. Returns the elapsed seconds.
+        """
+        started = time.perf_counter()
+        pending, futures = {}, []
+        for collection_name, doc in docs_by_collection:
+            batch = pending.setdefault(collection_name, [])
+            batch.append(doc)
+            if len(batch) >= self.batch_size:
+                futures.append(self.submit(collection_name, batch))
+                pending[collection_name] = []
+        for collection_name, batch in pending.items():
+            if batch:
+                futures.append(self.submit(collection_name, batch))
+        for future in wait(futures).done:
+            future.result()
+        return time.perf_counter() - started
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+
+
+def tagged(collection_name, docs):
+    return ((collection_name, doc) for doc in docs)
+
+def orders_and_payments(client_count, services, count):
+    for order, payment in iter_orders_and_payments(client_count, services, count):
+        yield "orders", order
+        if payment:
+            yield "payments", payment
+
+
+def seed_database(preset: str = "demo", batch_size: int = SEED_BATCH_SIZE, workers: int = SEED_WORKERS):
     """Populate database with mock data"""
-    print("Starting database seeding...")
-    
+    sizes = PRESETS[preset]
+    print(f"Starting database seeding ({preset}: {sizes})...")
+
     #test connection
     if not test_connection():
         return False
-    
-    
-    print("Generating mock data...")
-    clients = generate_clients(50)
-    courses = generate_courses(5)
-    classes = generate_classes(25)
-    orders = generate_orders(clients, courses, classes, 100)
-    payments = generate_payments(orders)
-    attendance = generate_attendance(classes, clients)
-    
-    #insert data into collections
-    collections_data = {
-        "clients": clients,
-        "courses": courses,
-        "classes": classes,
-        "orders": orders,
-        "payments": payments,
-        "attendance": attendance
-    }
-    
-    for collection_name, data in collections_data.items():
-        if data:
-            collection = get_sync_collection(collection_name)
-            # clear existing data
-            collection.drop()
-            # insert new data
-            collection.insert_many(data)
-            print(f"Inserted {len(data)} records into {collection_name}")
-    
+
+    # clear existing data
+    for collection_name in ("clients", "courses", "classes", "orders", "payments", "attendance"):
+        get_sync_collection(collection_name).drop()
+
+    courses = generate_courses(sizes["courses"])
+    classes = generate_classes(sizes["classes"], client_count=sizes["clients"])
+    services = services_from(courses, classes)
+
+    loader = BulkLoader(workers, batch_size)
+    phases = [
+        ("clients", tagged("clients", iter_clients(sizes["clients"]))),
+        ("courses + classes", itertools.chain(tagged("courses", courses), tagged("classes", classes))),
+        ("orders + payments", orders_and_payments(sizes["clients"], services, sizes["orders"])),
+        ("attendance", tagged("attendance", iter_attendance(classes))),
+    ]
+
+    total_started = time.perf_counter()
+    try:
+        for label, docs in phases:
+            before = sum(loader.inserted.values())
+            elapsed = loader.load(docs)
+            written = sum(loader.inserted.values()) - before
+            print(f"{label:<18} {written:>11,} docs in {elapsed:8.2f}s  ({written / elapsed if elapsed else 0:,.0f} docs/sec)")
+    finally:
+        loader.shutdown()
+    total_elapsed = time.perf_counter() - total_started
+
+    for collection_name, count in loader.inserted.items():
+        print(f"Inserted {count} records into {collection_name}")
+    if loader.errors:
+        print(f"{loader.errors} documents failed to insert")
+    total = sum(loader.inserted.values())
+    print(f"Total: {total:,} docs in {total_elapsed:.2f}s ({total / total_elapsed if total_elapsed else 0:,.0f} docs/sec)")
+
+    ensure_indexes()
+    rebuild_rollups(sync_db)
+    print("Rebuilt dashboard rollups")
+
     print("Database seeding completed!")
     return True
 
 if __name__ == "__main__":
-    seed_database() 
+    parser = argparse.ArgumentParser(description="Seed the database with mock data")
+    parser.add_argument("--preset", choices=PRESETS, default="demo")
+    parser.add_argument("--batch-size", type=int, default=SEED_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=SEED_WORKERS)
+    args = parser.parse_args()
+    seed_database(args.preset, args.batch_size, args.workers)
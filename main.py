@@ -1,21 +1,280 @@
-from fastapi import FastAPI, Body, Header
+import importlib
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+from fastapi import FastAPI, Body, Header, HTTPException, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from apis.handlers import router
-from agents.support_agent import get_support_crew
-from agents.dashboard_agent import get_dashboard_crew
+from agents.dashboard_router import dashboard_router
+from tools.memory_backend import MongoMemoryBackend
+from utils.agent_runner import agent_runner, AgentQueueFull
+from models.database import connections, ensure_indexes
+from tools.rollups import ensure_rollups
+from utils.cache import analytics_cache
+from utils.response_cache import response_cache
+from utils.translate import translation_stats
+from utils.streaming import EventStream
+from utils.rate_limit import llm_stats
+from utils.job_queue import job_queue
+from utils.timing import (
+    stage, stage_timer, request_timer, start_trace, get_trace, exposition, register_collector,
+)
 
-app = FastAPI(title="Multi-Agent Backend API")
+# build the agents' crews at startup; false serves sooner and builds them on the first agent query
+WARM_AGENTS = os.getenv("WARM_AGENTS", "true").lower() == "true"
+
+
+def support_agent():
+    """agents.support_agent, imported on first use since it loads CrewAI"""
+    return importlib.import_module("agents.support_agent")
+
+def dashboard_agent():
+    return importlib.import_module("agents.dashboard_agent")
+
+# for cache hits and routed prompts, which skip the agents
+memory_backend = MongoMemoryBackend()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    bootstrap_database()
+    if WARM_AGENTS:
+        warm_crew_pools()
+    job_queue.start()
+    yield
+    job_queue.stop()
+    agent_runner.shutdown()
+    connections.close()
+
+
+app = FastAPI(title="Multi-Agent Backend API", lifespan=lifespan)
 
 #test routes from apis.handlers
 app.include_router(router)
 
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """Give every request a new trace (X-Trace-Id; a client's own id is kept as client_trace_id) and time it"""
+    trace = start_trace(client_trace_id=request.headers.get("x-trace-id"))
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        response.headers["X-Trace-Id"] = trace.trace_id
+        return response
+    finally:
+        # raw paths of unmatched requests would make the route label unbounded
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        request_timer.record((request.method, route, str(status)), time.perf_counter() - started)
+
+
+@register_collector
+def service_counters():
+    responses = response_cache.stats()
+    analytics = analytics_cache.stats()
+    llm = llm_stats()
+    router = dashboard_router.stats()
+    runner = agent_runner.stats()
+    pools = connections.stats()["clients"]
+    jobs = job_queue.counters()
+    return [
+        ("cache_lookups_total", "counter", "Cache lookups by cache and outcome", {
+            (("cache", "analytics"), ("outcome", "hit")): analytics["hits"],
+            (("cache", "analytics"), ("outcome", "miss")): analytics["misses"],
+            (("cache", "responses"), ("outcome", "hit")): responses["exact_hits"] + responses["similar_hits"],
+            (("cache", "responses"), ("outcome", "miss")): responses["misses"],
+        }),
+        ("llm_provider_calls_total", "counter", "LLM calls sent to the provider", {(): llm["coalescing"]["provider_calls"]}),
+        ("llm_coalesced_calls_total", "counter", "LLM calls answered by an identical in-flight call", {(): llm["coalescing"]["coalesced"]}),
+        ("llm_retries_total", "counter", "LLM calls retried after 429/5xx", {(): llm["retry"]["retries"]}),
+        ("dashboard_router_total", "counter", "Dashboard prompts by routing outcome", {
+            (("outcome", "routed"),): router["routed"],
+            (("outcome", "fallback"),): router["fallback"],
+            (("outcome", "error"),): router["errors"],
+        }),
+        ("agent_runs_pending", "gauge", "Agent runs running or queued", {(): runner["pending"]}),
+        ("mongo_connections_open", "gauge", "Open MongoDB connections by client", {
+            (("client", kind),): pool["open"] for kind, pool in pools.items()}),
+        ("mongo_connections_in_use", "gauge", "MongoDB connections checked out by client", {
+            (("client", kind),): pool["in_use"] for kind, pool in pools.items()}),
+        ("mongo_checkout_failures_total", "counter", "Failed MongoDB connection checkouts by client", {
+            (("client", kind),): pool["checkout_failed"] for kind, pool in pools.items()}),
+        ("agent_jobs_finished_total", "counter", "Background agent jobs finished by this process", {
+            (("status", status),): count for status, count in jobs["finished"].items()}),
+        ("agent_job_webhooks_total", "counter", "Job webhook deliveries by outcome", {
+            (("outcome", outcome),): count for outcome, count in jobs["webhooks"].items()}),
+    ]
+
+
+def run_support_query(prompt: str, session_id: str):
+    # cached answers are shared across sessions, so cacheable prompts run without history
+    use_memory = not response_cache.cacheable(prompt)
+    return response_cache.get_or_run(
+        "support", prompt,
+        run=lambda: support_agent().get_support_crew(prompt, session_id=session_id, use_memory=use_memory).kickoff(),
+        on_hit=lambda: memory_backend.save_memory(session_id, prompt)
+    )
+
+def run_dashboard_crew(prompt: str, session_id: str, use_memory: bool = True):
+    try:
+        with stage("router"):
+            routed = dashboard_router.route(prompt)
+    except Exception as e:
+        # a failing metric query must not fail the request; the crew can still answer
+        print(f"Dashboard router failed, falling back to the crew: {e}")
+        dashboard_router.record_error()
+        routed = None
+    if routed:
+        memory_backend.save_memory(session_id, prompt)
+        return routed
+    return dashboard_agent().get_dashboard_crew(prompt, session_id=session_id, use_memory=use_memory).kickoff()
+
+def run_dashboard_query(prompt: str, session_id: str):
+    use_memory = not response_cache.cacheable(prompt)
+    return response_cache.get_or_run(
+        "dashboard", prompt,
+        run=lambda: run_dashboard_crew(prompt, session_id, use_memory),
+        on_hit=lambda: memory_backend.save_memory(session_id, prompt)
+    )
+
+def queue_full(e: AgentQueueFull):
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+
+async def run_agent(fn, prompt: str, session_id: str):
+    try:
+        return await agent_runner.run(fn, prompt, session_id)
+    except AgentQueueFull as e:
+        raise queue_full(e)
+
+def run_streamed(fn, stream: EventStream, prompt: str, session_id: str):
+    with stream.bind():
+        return fn(prompt, session_id)
+
+def stream_agent(fn, prompt: str, session_id: str):
+    stream = EventStream()
+    try:
+        future = agent_runner.submit(run_streamed, fn, stream, prompt, session_id)
+    except AgentQueueFull as e:
+        raise queue_full(e)
+    return StreamingResponse(
+        stream.events(future),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.post("/support/query")
 async def support_query(prompt: str = Body(..., embed=True), session_id: str = Header(default="default_user")):
-    crew = get_support_crew(prompt, session_id=session_id)
-    result = crew.kickoff()
+    result = await run_agent(run_support_query, prompt, session_id)
     return {"response": result}
 
 @app.post("/dashboard/query")
 async def dashboard_query(prompt: str = Body(..., embed=True), session_id: str = Header(default="default_user")):
-    crew = get_dashboard_crew(prompt, session_id=session_id)
-    result = crew.kickoff()
+    result = await run_agent(run_dashboard_query, prompt, session_id)
     return {"response": result}
+
+@app.post("/support/query/stream")
+async def support_query_stream(prompt: str = Body(..., embed=True), session_id: str = Header(default="default_user")):
+    return stream_agent(run_support_query, prompt, session_id)
+
+@app.post("/dashboard/query/stream")
+async def dashboard_query_stream(prompt: str = Body(..., embed=True), session_id: str = Header(default="default_user")):
+    return stream_agent(run_dashboard_query, prompt, session_id)
+
+# background jobs: same runs as /query, answered through GET /jobs/{job_id} or a webhook
+job_queue.register("support", run_support_query)
+job_queue.register("dashboard", run_dashboard_query)
+
+async def submit_job(kind: str, prompt: str, session_id: str, priority: str, webhook_url: Optional[str],
+                     idempotency_key: Optional[str]):
+    try:
+        return await job_queue.submit(kind, prompt, session_id, priority, webhook_url, idempotency_key)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/support/jobs", status_code=202)
+async def support_job(prompt: str = Body(..., embed=True), priority: str = Body("normal", embed=True),
+                      webhook_url: Optional[str] = Body(None, embed=True),
+                      session_id: str = Header(default="default_user"),
+                      idempotency_key: Optional[str] = Header(default=None)):
+    return await submit_job("support", prompt, session_id, priority, webhook_url, idempotency_key)
+
+@app.post("/dashboard/jobs", status_code=202)
+async def dashboard_job(prompt: str = Body(..., embed=True), priority: str = Body("normal", embed=True),
+                        webhook_url: Optional[str] = Body(None, embed=True),
+                        session_id: str = Header(default="default_user"),
+                        idempotency_key: Optional[str] = Header(default=None)):
+    return await submit_job("dashboard", prompt, session_id, priority, webhook_url, idempotency_key)
+
+@app.get("/jobs/stats")
+async def job_stats():
+    return await job_queue.stats()
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str, wait: float = 0):
+    job = await job_queue.get(job_id, wait)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return job
+
+@app.get("/agents/stats")
+async def agent_stats():
+    return {
+        "runner": agent_runner.stats(),
+        "support_crews": support_agent().support_crews.stats(),
+        "dashboard_crews": dashboard_agent().dashboard_crews.stats(),
+    }
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return {"analytics": analytics_cache.stats(), "responses": response_cache.stats()}
+
+@app.get("/translate/stats")
+async def translate_stats():
+    return translation_stats()
+
+@app.get("/llm/stats")
+async def llm_call_stats():
+    return llm_stats()
+
+@app.get("/stages/stats")
+async def stage_stats():
+    return stage_timer.stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(exposition(), media_type="text/plain; version=0.0.4")
+
+@app.get("/traces/{trace_id}")
+async def trace_detail(trace_id: str):
+    trace = get_trace(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Trace not found or already evicted")
+    return trace
+
+@app.get("/mongo/stats")
+async def mongo_stats():
+    return connections.stats()
+
+@app.get("/router/stats")
+async def router_stats():
+    return dashboard_router.stats()
+
+def bootstrap_database():
+    ensure_indexes()
+    try:
+        if ensure_rollups(connections.sync_db):
+            print("Built dashboard rollups")
+    except Exception as e:
+        print(f"Rollup bootstrap failed: {e}")
+
+def warm_crew_pools():
+    try:
+        support_agent().support_crews.warm()
+        dashboard_agent().dashboard_crews.warm()
+    except ValueError as e:
+        # no LLM credentials: the /test routes still work, agent queries fail until configured
+        print(f"Agent warm-up skipped: {e}")
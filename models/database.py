@@ -1,6 +1,9 @@
-from pymongo import MongoClient
+from pymongo import MongoClient, IndexModel, ASCENDING, monitoring
+from pymongo.read_preferences import make_read_preference, read_pref_mode_from_name
 from motor.motor_asyncio import AsyncIOMotorClient
+from collections import Counter
 import os
+import threading
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -8,15 +11,171 @@ load_dotenv()
 # MongoDB connection
 MONGODB_URL = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
 DATABASE_NAME = os.getenv("DATABASE_NAME", "fitness_studio")
+MEMORY_DATABASE_NAME = os.getenv("MEMORY_DATABASE_NAME", "crew_memory")
+# idle conversation sessions are removed after this many seconds
+MEMORY_SESSION_TTL = int(os.getenv("MEMORY_SESSION_TTL", "604800"))
+# finished agent jobs (and idle job sessions) are removed after this many seconds
+JOB_RESULT_TTL = int(os.getenv("JOB_RESULT_TTL", "86400"))
 
-# data seeding synchronous operations
-sync_client = MongoClient(MONGODB_URL)
-sync_db = sync_client[DATABASE_NAME]
+# connection pool sizing, shared by the sync and async clients
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "10000"))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "10000"))
+# where dashboard reads go: primary, primaryPreferred, secondary, secondaryPreferred or nearest
+DASHBOARD_READ_PREFERENCE = os.getenv("DASHBOARD_READ_PREFERENCE", "primary")
+DASHBOARD_READ = make_read_preference(read_pref_mode_from_name(DASHBOARD_READ_PREFERENCE), None)
 
-# fastapi async operations
-async_client = AsyncIOMotorClient(MONGODB_URL)
-async_db = async_client[DATABASE_NAME]
 
+class PoolStats(monitoring.ConnectionPoolListener):
+    """Connection pool counters of one client, fed by pymongo's CMAP events"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = Counter()
+        self.servers = {}  # "host:port" -> Counter(open, in_use)
+
+    def _add(self, event, **deltas):
+        server = "%s:%s" % event.address
+        with self.lock:
+            self.counts.update(deltas)
+            self.servers.setdefault(server, Counter()).update(deltas)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._add(event, pool_cleared=1)
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._add(event, created=1, open=1)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._add(event, closed=1, open=-1)
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        self._add(event, checkout_failed=1)
+
+    def connection_checked_out(self, event):
+        self._add(event, checked_out=1, in_use=1)
+
+    def connection_checked_in(self, event):
+        self._add(event, in_use=-1)
+
+    def stats(self):
+        with self.lock:
+            totals = {key: self.counts[key] for key in
+                      ("open", "in_use", "created", "closed", "checked_out", "checkout_failed", "pool_cleared")}
+            totals["servers"] = {server: {"open": c["open"], "in_use": c["in_use"]}
+                                 for server, c in self.servers.items()}
+        return totals
+
+
+class Connections:
+    """
+    The process-wide MongoDB clients. Each is created on first use with the
+    MONGO_* pool settings, so a seeding script never opens the Motor pool
+    and the API never pays for a client it does not use. The sync and
+    async clients keep separate pools (pymongo and Motor cannot share one).
+    """
+
+    def __init__(self, url: str = MONGODB_URL):
+        self.url = url
+        self.lock = threading.Lock()
+        self.pool_stats = {"sync": PoolStats(), "async": PoolStats()}
+        self._sync_client = None
+        self._async_client = None
+
+    def options(self, kind: str) -> dict:
+        return {
+            "maxPoolSize": MONGO_MAX_POOL_SIZE,
+            "minPoolSize": MONGO_MIN_POOL_SIZE,
+            "maxIdleTimeMS": MONGO_MAX_IDLE_TIME_MS,
+            "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+            "waitQueueTimeoutMS": MONGO_WAIT_QUEUE_TIMEOUT_MS,
+            "event_listeners": [self.pool_stats[kind]],
+        }
+
+    @property
+    def sync_client(self) -> MongoClient:
+        if self._sync_client is None:
+            with self.lock:
+                if self._sync_client is None:
+                    self._sync_client = MongoClient(self.url, **self.options("sync"))
+        return self._sync_client
+
+    @property
+    def async_client(self) -> AsyncIOMotorClient:
+        if self._async_client is None:
+            with self.lock:
+                if self._async_client is None:
+                    self._async_client = AsyncIOMotorClient(self.url, **self.options("async"))
+        return self._async_client
+
+    # data seeding synchronous operations
+    @property
+    def sync_db(self):
+        return self.sync_client[DATABASE_NAME]
+
+    # fastapi async operations
+    @property
+    def async_db(self):
+        return self.async_client[DATABASE_NAME]
+
+    @property
+    def memory_db(self):
+        return self.sync_client[MEMORY_DATABASE_NAME]
+
+    # dashboard reads tolerate replication lag, so they may go to secondaries
+    @property
+    def dashboard_db(self):
+        return self.sync_client.get_database(DATABASE_NAME, read_preference=DASHBOARD_READ)
+
+    @property
+    def async_dashboard_db(self):
+        return self.async_client.get_database(DATABASE_NAME, read_preference=DASHBOARD_READ)
+
+    def stats(self):
+        """Pool settings and per-client connection counters, as served by GET /mongo/stats"""
+        clients = {"sync": self._sync_client, "async": self._async_client}
+        return {
+            "settings": {key: value for key, value in self.options("sync").items() if key != "event_listeners"},
+            "dashboard_read_preference": DASHBOARD_READ_PREFERENCE,
+            "clients": {kind: {"created": client is not None, **self.pool_stats[kind].stats()}
+                        for kind, client in clients.items()},
+        }
+
+    def close(self):
+        with self.lock:
+            for client in (self._sync_client, self._async_client):
+                if client is not None:
+                    client.close()
+            self._sync_client = self._async_client = None
+
+
+connections = Connections()
+
+
+def __getattr__(name):
+    # scripts still import sync_client/sync_db/async_db; resolving them here keeps the clients lazy
+    if name in ("sync_client", "async_client", "sync_db", "async_db"):
+        return getattr(connections, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 COLLECTIONS = {
     "clients": "clients",
@@ -27,18 +186,94 @@ COLLECTIONS = {
     "attendance": "attendance"
 }
 
+# index spec per collection, applied idempotently by ensure_indexes()
+INDEXES = {
+    "clients": [
+        IndexModel([("client_id", ASCENDING)], name="client_id"),
+        IndexModel([("idempotency_key", ASCENDING)], name="idempotency_key", unique=True,
+                   partialFilterExpression={"idempotency_key": {"$exists": True}}),
+        IndexModel([("status", ASCENDING)], name="status"),
+        IndexModel([("registration_date", ASCENDING)], name="registration_date"),
+        IndexModel([("name_tokens", ASCENDING)], name="name_tokens"),
+        IndexModel([("email_lower", ASCENDING)], name="email_lower"),
+        IndexModel([("phone_digits", ASCENDING)], name="phone_digits"),
+    ],
+    "orders": [
+        IndexModel([("order_id", ASCENDING)], name="order_id", unique=True),
+        # retried writes carry the same client-supplied key and hit this instead of inserting twice
+        IndexModel([("idempotency_key", ASCENDING)], name="idempotency_key", unique=True,
+                   partialFilterExpression={"idempotency_key": {"$exists": True}}),
+        IndexModel([("client_id", ASCENDING), ("status", ASCENDING)], name="client_id_status"),
+        # equality + keyset sort on order_id for the paged order lists
+        IndexModel([("client_id", ASCENDING), ("order_id", ASCENDING)], name="client_id_order_id"),
+        IndexModel([("status", ASCENDING), ("order_id", ASCENDING)], name="status_order_id"),
+    ],
+    "payments": [
+        IndexModel([("order_id", ASCENDING)], name="order_id"),
+    ],
+    "courses": [
+        IndexModel([("course_id", ASCENDING)], name="course_id"),
+    ],
+    "classes": [
+        IndexModel([("class_id", ASCENDING)], name="class_id"),
+        IndexModel([("date", ASCENDING), ("class_id", ASCENDING)], name="date_class_id"),
+        IndexModel([("name", ASCENDING)], name="name"),
+        IndexModel([("instructor_tokens", ASCENDING)], name="instructor_tokens"),
+    ],
+    "attendance": [
+        IndexModel([("class_id", ASCENDING), ("attended", ASCENDING)], name="class_id_attended"),
+    ],
+    "rollup_class_attendance": [
+        IndexModel([("class", ASCENDING)], name="class"),
+    ],
+    "agent_jobs": [
+        # claim: queued jobs of the worker's lanes, highest lane then oldest first
+        IndexModel([("status", ASCENDING), ("lane", ASCENDING), ("created_at", ASCENDING)], name="status_lane_created_at"),
+        # a session's oldest unfinished job is the only one that may run
+        IndexModel([("session_id", ASCENDING), ("seq", ASCENDING)], name="session_id_seq"),
+        IndexModel([("status", ASCENDING), ("lease_until", ASCENDING)], name="status_lease_until"),
+        IndexModel([("idempotency_key", ASCENDING)], name="idempotency_key", unique=True,
+                   partialFilterExpression={"idempotency_key": {"$exists": True}}),
+        IndexModel([("finished_at", ASCENDING)], name="finished_at_ttl", expireAfterSeconds=JOB_RESULT_TTL),
+    ],
+    "agent_job_sessions": [
+        IndexModel([("updated_at", ASCENDING)], name="updated_at_ttl", expireAfterSeconds=JOB_RESULT_TTL),
+    ],
+}
+
+MEMORY_INDEXES = {
+    "session_memory": [
+        IndexModel([("session_id", ASCENDING)], name="session_id", unique=True),
+        IndexModel([("updated_at", ASCENDING)], name="updated_at_ttl", expireAfterSeconds=MEMORY_SESSION_TTL),
+    ],
+}
+
 def get_sync_collection(collection_name: str):
     """Get synchronous collection for data operations"""
-    return sync_db[COLLECTIONS[collection_name]]
+    return connections.sync_db[COLLECTIONS[collection_name]]
 
 async def get_async_collection(collection_name: str):
     """Get asynchronous collection for API operations"""
-    return async_db[COLLECTIONS[collection_name]]
+    return connections.async_db[COLLECTIONS[collection_name]]
+
+def ensure_indexes():
+    """Create every index in INDEXES/MEMORY_INDEXES; safe to run repeatedly"""
+    targets = [(connections.sync_db, INDEXES), (connections.memory_db, MEMORY_INDEXES)]
+    ok = True
+    for db, spec in targets:
+        for collection_name, indexes in spec.items():
+            try:
+                created = db[collection_name].create_indexes(indexes)
+                print(f"Indexes ready on {db.name}.{collection_name}: {', '.join(created)}")
+            except Exception as e:
+                print(f"Index creation failed on {db.name}.{collection_name}: {e}")
+                ok = False
+    return ok
 
 def test_connection():
     """Test MongoDB connection"""
     try:
-        sync_client.admin.command('ping')
+        connections.sync_client.admin.command('ping')
         print("MongoDB connection successful!")
         return True
     except Exception as e:
@@ -34,6 +34,10 @@ class Client(BaseModel):
     registration_date: datetime
     birthday: Optional[datetime] = None
     address: Optional[str] = None
+    # normalized search fields, see utils/search.py
+    name_tokens: List[str] = []
+    email_lower: Optional[str] = None
+    phone_digits: Optional[str] = None
 
 
 #order collection
@@ -86,6 +90,7 @@ class Class(BaseModel):
     enrolled_students: List[str] = []  # List of client IDs
     status: ClassStatus = ClassStatus.SCHEDULED
     price: float
+    instructor_tokens: List[str] = []
 
 
 #attendance collection
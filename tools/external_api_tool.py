@@ -1,17 +1,92 @@
-from models.database import async_db
+from models.database import connections
 from datetime import datetime
+from collections import Counter
+import math
+import os
 import uuid
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from utils.search import client_search_fields
+from utils.cache import record_write
+from tools import mongo_queries as q
+from tools import rollups
+
+# most orders accepted by one create_orders call
+BULK_ORDER_LIMIT = int(os.getenv("BULK_ORDER_LIMIT", "1000"))
+
+ORDER_TEXT_FIELDS = ("client_id", "service_id", "service_type", "service_name")
+ORDER_REQUIRED_FIELDS = ORDER_TEXT_FIELDS + ("amount",)
+DUPLICATE_KEY = 11000
+
+
+class IdempotencyRace(Exception):
+    """A concurrent request inserted the same idempotency key inside our transaction."""
+
+
+def new_order(item: dict) -> dict:
+    # checked before anything is written, so a bad item rejects the whole batch
+    # instead of leaving orders inserted and the rollups half-updated
+    if not isinstance(item, dict):
+        raise ValueError(f"expected an object, got {type(item).__name__}")
+    missing = [field for field in ORDER_REQUIRED_FIELDS if item.get(field) in (None, "")]
+    if missing:
+        raise ValueError(f"missing {', '.join(missing)}")
+    not_text = [field for field in ORDER_TEXT_FIELDS if not isinstance(item[field], str)]
+    if not_text:
+        raise ValueError(f"{', '.join(not_text)} must be text")
+    amount = item["amount"]
+    if isinstance(amount, bool) or not isinstance(amount, (int, float)) or not math.isfinite(amount) or amount < 0:
+        raise ValueError(f"amount must be a non-negative number, got {amount!r}")
+    now = datetime.utcnow()
+    order = {
+        "order_id": f"ORDER_{uuid.uuid4().hex[:8].upper()}",
+        "client_id": item["client_id"],
+        "service_id": item["service_id"],
+        "service_type": item["service_type"],
+        "service_name": item["service_name"],
+        "amount": item["amount"],
+        "status": "pending",
+        "order_date": now,
+        "due_date": now
+    }
+    if item.get("idempotency_key"):
+        order["idempotency_key"] = str(item["idempotency_key"])
+    return order
+
 
 class ExternalAPITool:
     def __init__(self):
-        self.db = async_db
+        self._transactions = None
+
+    @property
+    def db(self):
+        return connections.async_db
+
+    async def supports_transactions(self) -> bool:
+        """Multi-document transactions need a replica set or mongos"""
+        if self._transactions is None:
+            hello = await self.db.client.admin.command("hello")
+            self._transactions = "setName" in hello or hello.get("msg") == "isdbgrid"
+        return self._transactions
+
+    async def in_session(self, work):
+        """
+        Run work(session) in a transaction where the deployment supports it,
+        otherwise in a plain causally consistent session (standalone mongod).
+        """
+        async with await self.db.client.start_session() as session:
+            if await self.supports_transactions():
+                return await session.with_transaction(work)
+            return await work(session)
 
-    async def create_client_enquiry(self, client_data: dict):
+    async def create_client_enquiry(self, client_data: dict, idempotency_key: str = None):
         """
         simulate creation of a new client enquiry in the 'clients' collection.
         required: name, email, phone
-        optional: birthday, address
+        optional: birthday, address, idempotency_key (a retry with the same key
+        returns the client created the first time)
         """
+        idempotency_key = idempotency_key or client_data.get("idempotency_key")
         client = {
             "client_id": f"CLIENT_{uuid.uuid4().hex[:8].upper()}",
             "name": client_data["name"],
@@ -23,12 +98,25 @@ class ExternalAPITool:
             "birthday": client_data.get("birthday"),
             "address": client_data.get("address")
         }
+        client.update(client_search_fields(client))
+        if idempotency_key:
+            client["idempotency_key"] = str(idempotency_key)
 
-        await self.db.clients.insert_one(client)
+        async def write(session):
+            await self.db.clients.insert_one(client, session=session)
+            await rollups.record_client(self.db, client, session)
+
+        try:
+            await self.in_session(write)
+        except DuplicateKeyError:
+            existing = await self.db.clients.find_one(
+                q.by_idempotency_keys([client["idempotency_key"]]), q.IDEMPOTENCY_FIELDS)
+            return {"message": "Client enquiry already exists", "client_id": existing["client_id"]}
+        record_write("clients")
         return {"message": "Client enquiry created", "client_id": client["client_id"]}
 
 
-    async def create_order(self, client_id: str, service_info: dict):
+    async def create_order(self, client_id: str, service_info: dict, idempotency_key: str = None):
         """
         Simulate order creation using client_id + service (course/class) info.
         service_info = {
@@ -38,18 +126,105 @@ class ExternalAPITool:
             "amount": 2500
         }
         """
-        order_id = f"ORDER_{uuid.uuid4().hex[:8].upper()}"
-        order = {
-            "order_id": order_id,
-            "client_id": client_id,
-            "service_id": service_info["service_id"],
-            "service_type": service_info["service_type"],
-            "service_name": service_info["service_name"],
-            "amount": service_info["amount"],
-            "status": "pending",
-            "order_date": datetime.utcnow(),
-            "due_date": datetime.utcnow()
+        result = await self.create_orders([{**service_info, "client_id": client_id, "idempotency_key": idempotency_key}])
+        if result["created"]:
+            return {"message": "Order created", "order_id": result["created"][0]["order_id"]}
+        return {"message": "Order already exists", "order_id": result["duplicates"][0]["order_id"]}
+
+    async def create_orders(self, items: list):
+        """
+        Create many orders in one round of unordered bulk writes. Each item
+        has the create_order fields plus client_id and an optional
+        idempotency_key; an item whose key was already used (earlier in the
+        batch or by a previous request) is reported under "duplicates" with
+        the existing order_id instead of being inserted again. The orders,
+        each client's enrolled_services, course enrolled_count and the
+        rollups are written in one transaction where available.
+        """
+        if not items:
+            raise ValueError("No orders given")
+        if len(items) > BULK_ORDER_LIMIT:
+            raise ValueError(f"At most {BULK_ORDER_LIMIT} orders per request, got {len(items)}")
+
+        orders, duplicates, seen = [], [], {}
+        for index, item in enumerate(items):
+            try:
+                order = new_order(item)
+            except ValueError as e:
+                raise ValueError(f"Order {index}: {e}")
+            key = order.get("idempotency_key")
+            if key in seen:
+                duplicates.append({"index": index, "idempotency_key": key, "order_id": seen[key]["order_id"]})
+                continue
+            if key:
+                seen[key] = order
+            order["_index"] = index
+            orders.append(order)
+
+        for attempt in range(2):
+            try:
+                inserted, existing = await self.in_session(lambda session: self._write_orders(orders, session))
+                break
+            except IdempotencyRace:
+                # the second attempt finds the racing request's orders in its lookup
+                if attempt:
+                    raise
+
+        if inserted:
+            record_write("orders", "clients", "courses")
+        duplicates += [{"index": o["_index"], "idempotency_key": o["idempotency_key"],
+                        "order_id": existing[o["idempotency_key"]]}
+                       for o in orders if o.get("idempotency_key") in existing]
+        return {
+            "created": [{"index": o["_index"], "order_id": o["order_id"]} for o in inserted],
+            "duplicates": sorted(duplicates, key=lambda d: d["index"]),
         }
-        await self.db.orders.insert_one(order)
-        return {"message": "Order created", "order_id": order_id}
 
+    async def _write_orders(self, orders: list, session):
+        """Insert orders whose keys are unused and apply them; returns (inserted, existing key -> order_id)"""
+        keys = [o["idempotency_key"] for o in orders if "idempotency_key" in o]
+        existing = {}
+        if keys:
+            async for doc in self.db.orders.find(q.by_idempotency_keys(keys), q.IDEMPOTENCY_FIELDS, session=session):
+                existing[doc["idempotency_key"]] = doc["order_id"]
+        fresh = [o for o in orders if o.get("idempotency_key") not in existing]
+        documents = [{k: v for k, v in o.items() if k != "_index"} for o in fresh]
+
+        inserted = fresh
+        if documents:
+            try:
+                await self.db.orders.insert_many(documents, ordered=False, session=session)
+            except BulkWriteError as e:
+                errors = e.details.get("writeErrors", [])
+                if any(err["code"] != DUPLICATE_KEY for err in errors):
+                    raise
+                if session.in_transaction:
+                    raise IdempotencyRace() from e
+                # without a transaction the other orders are written; look up the winners of the race
+                failed = {err["index"] for err in errors}
+                inserted = [o for i, o in enumerate(fresh) if i not in failed]
+                raced = [fresh[i]["idempotency_key"] for i in failed]
+                async for doc in self.db.orders.find(q.by_idempotency_keys(raced), q.IDEMPOTENCY_FIELDS, session=session):
+                    existing[doc["idempotency_key"]] = doc["order_id"]
+
+        if inserted:
+            await self._apply_enrollments(inserted, session)
+            await rollups.record_orders(self.db, inserted, session)
+        return inserted, existing
+
+    async def _apply_enrollments(self, orders: list, session):
+        """Add each ordered service to its client and bump course enrolled_count"""
+        services_by_client = {}
+        for order in orders:
+            services_by_client.setdefault(order["client_id"], set()).add(order["service_id"])
+        await self.db.clients.bulk_write([
+            UpdateOne(q.client_by_id(client_id), {"$addToSet": {"enrolled_services": {"$each": sorted(services)}}})
+            for client_id, services in services_by_client.items()
+        ], ordered=False, session=session)
+
+        courses = Counter(o["service_id"] for o in orders if o["service_type"] == "course")
+        if courses:
+            await self.db.courses.bulk_write([
+                UpdateOne(q.course_by_id(course_id), {"$inc": {"enrolled_count": count}})
+                for course_id, count in courses.items()
+            ], ordered=False, session=session)
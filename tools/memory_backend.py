@@ -1,26 +1,76 @@
 # tools/memory_backend.py
-from pymongo import MongoClient
 from datetime import datetime
 import os
+from models.database import connections
+
+# turns kept verbatim per session
+MEMORY_TURNS = int(os.getenv("MEMORY_TURNS", "5"))
+# size of the running summary of older turns; 0 disables compaction
+MEMORY_SUMMARY_CHARS = int(os.getenv("MEMORY_SUMMARY_CHARS", "0"))
+
+
+def compaction_pipeline(message: str, max_turns: int, summary_chars: int, now: datetime) -> list:
+    """
+    Update pipeline that appends message, keeps the last max_turns and folds
+    the evicted turns into summary (joined with " | ", newest summary_chars
+    kept), all in one server-side write.
+    """
+    overflow = {"$max": [0, {"$subtract": [{"$size": "$_turns"}, max_turns]}]}
+    evicted = {"$filter": {"input": {"$slice": ["$_turns", overflow]}, "cond": {"$ne": ["$$this", ""]}}}
+    joined = {"$reduce": {
+        "input": evicted,
+        "initialValue": {"$ifNull": ["$summary", ""]},
+        "in": {"$cond": [{"$eq": ["$$value", ""]}, "$$this", {"$concat": ["$$value", " | ", "$$this"]}]},
+    }}
+    newest = {"$let": {"vars": {"text": joined}, "in": {"$substrCP": [
+        "$$text", {"$max": [0, {"$subtract": [{"$strLenCP": "$$text"}, summary_chars]}]}, summary_chars]}}}
+    return [
+        # $literal: a message starting with "$" must not be read as a field path
+        {"$set": {"_turns": {"$concatArrays": [{"$ifNull": ["$turns", []]}, [{"$literal": message}]]},
+                  "updated_at": now}},
+        {"$set": {"summary": {"$cond": [{"$gt": [overflow, 0]}, newest, "$summary"]},
+                  "turns": {"$slice": ["$_turns", -max_turns]}}},
+        {"$unset": "_turns"},
+    ]
+
 
 class MongoMemoryBackend:
-    def __init__(self):
-        mongo_url = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
-        self.client = MongoClient(mongo_url)
-        self.db = self.client["crew_memory"]
-        self.collection = self.db["memory_sessions"]
+    """
+    One document per session holding a ring of the last MEMORY_TURNS
+    messages, updated atomically with $push/$slice. Idle sessions expire
+    through the TTL index on updated_at (see MEMORY_INDEXES). With
+    MEMORY_SUMMARY_CHARS set, turns that fall off the ring are folded into
+    a running summary in the same update (see compaction_pipeline).
+    """
+
+    def __init__(self, max_turns: int = MEMORY_TURNS, summary_chars: int = MEMORY_SUMMARY_CHARS):
+        self.max_turns = max_turns
+        self.summary_chars = summary_chars
+
+    @property
+    def collection(self):
+        return connections.memory_db["session_memory"]
 
     def save_memory(self, session_id: str, message: str):
         """Store user message in memory under session ID."""
-        self.collection.insert_one({
-            "session_id": session_id,
-            "message": message,
-            "timestamp": datetime.utcnow()
-        })
-
-    def get_memory(self, session_id: str, limit=5):
-        """Fetch recent messages for session ID."""
-        docs = self.collection.find(
-            {"session_id": session_id}
-        ).sort("timestamp", -1).limit(limit)
-        return [doc["message"] for doc in reversed(list(docs))]
+        if self.summary_chars:
+            update = compaction_pipeline(message, self.max_turns, self.summary_chars, datetime.utcnow())
+        else:
+            update = {
+                "$push": {"turns": {"$each": [message], "$slice": -self.max_turns}},
+                "$set": {"updated_at": datetime.utcnow()},
+            }
+        self.collection.update_one({"session_id": session_id}, update, upsert=True)
+
+    def get_memory(self, session_id: str, limit=MEMORY_TURNS):
+        """Fetch recent messages for session ID, preceded by the summary if any."""
+        doc = self.collection.find_one(
+            {"session_id": session_id},
+            {"_id": 0, "turns": {"$slice": -limit}, "summary": 1},
+        )
+        if not doc:
+            return []
+        memory = list(doc.get("turns", []))
+        if doc.get("summary"):
+            memory.insert(0, f"Earlier in this conversation: {doc['summary']}")
+        return memory
@@ -0,0 +1,232 @@
+"""
+Query definitions shared by MongoDBTool (pymongo) and AsyncMongoDBTool (motor).
+Each function only builds filters/pipelines or shapes raw results, so the
+sync and async tools run exactly the same queries.
+"""
+from datetime import datetime, timedelta
+from utils import search
+from tools import rollups
+
+LIST_LIMIT = 20
+# rows per NDJSON export batch fetched from the server
+EXPORT_BATCH_SIZE = 500
+
+# per-tool projections: only the fields an answer needs, never ObjectIds,
+# addresses, birthdays or full enrolled_students arrays
+CLIENT_FIELDS = {"_id": 0, "client_id": 1, "name": 1, "email": 1, "phone": 1, "status": 1, "enrolled_services": 1}
+ORDER_FIELDS = {"_id": 0, "order_id": 1, "client_id": 1, "service_name": 1, "service_type": 1,
+                "amount": 1, "status": 1, "order_date": 1, "due_date": 1}
+PAYMENT_FIELDS = {"_id": 0, "payment_id": 1, "order_id": 1, "client_id": 1, "amount": 1,
+                  "payment_date": 1, "payment_method": 1, "transaction_id": 1}
+CLASS_FIELDS = {"_id": 0, "class_id": 1, "name": 1, "instructor": 1, "date": 1, "duration_minutes": 1,
+                "status": 1, "price": 1, "max_students": 1, "enrolled": {"$size": "$enrolled_students"}}
+AMOUNT_FIELDS = {"_id": 0, "amount": 1}
+
+# ------------------ SUPPORT AGENT QUERIES ------------------
+
+def search_clients(name=None, email=None, phone=None):
+    query = {}
+    name_query = search.tokens_prefix_query(name)
+    if name_query:
+        query["name_tokens"] = name_query
+    email_lower = search.normalize_text(email)
+    if email_lower:
+        query["email_lower"] = search.prefix(email_lower)
+    digits = search.phone_digits(phone)
+    if digits:
+        query["phone_digits"] = search.prefix(digits)
+    return query
+
+def orders_by_client(client_id):
+    return {"client_id": client_id}
+
+def order_by_id(order_id):
+    return {"order_id": order_id}
+
+def orders_by_status(status):
+    return {"status": status}
+
+def payment_by_order(order_id):
+    return {"order_id": order_id}
+
+def pending_orders_by_client(client_id):
+    return {"client_id": client_id, "status": "pending"}
+
+def pending_dues(client_id, orders):
+    return {"client_id": client_id, "pending_dues": sum(order.get("amount", 0) for order in orders)}
+
+def upcoming_classes():
+    return {"date": {"$gte": datetime.utcnow()}}
+
+# keyset sorts for paging; each ends in a unique field so the order is total
+CLIENTS_SORT = [("client_id", 1)]
+ORDERS_SORT = [("order_id", 1)]
+UPCOMING_CLASSES_SORT = [("date", 1), ("class_id", 1)]
+CLASSES_SORT = [("class_id", 1)]
+
+def classes_by_instructor(instructor):
+    instructor_query = search.tokens_prefix_query(instructor)
+    if not instructor_query:
+        return {"instructor_tokens": {"$in": []}}
+    return {"instructor_tokens": instructor_query}
+
+# list methods that page and export: name -> (collection, filter builder, projection, keyset sort)
+LIST_QUERIES = {
+    "search_clients": ("clients", search_clients, CLIENT_FIELDS, CLIENTS_SORT),
+    "get_orders_by_client": ("orders", orders_by_client, ORDER_FIELDS, ORDERS_SORT),
+    "filter_orders_by_status": ("orders", orders_by_status, ORDER_FIELDS, ORDERS_SORT),
+    "list_upcoming_classes": ("classes", upcoming_classes, CLASS_FIELDS, UPCOMING_CLASSES_SORT),
+    "filter_classes_by_instructor": ("classes", classes_by_instructor, CLASS_FIELDS, CLASSES_SORT),
+}
+
+# ------------------ WRITE PATH QUERIES ------------------
+# lookups ExternalAPITool makes while writing; all served by indexes
+
+IDEMPOTENCY_FIELDS = {"_id": 0, "idempotency_key": 1, "order_id": 1, "client_id": 1}
+
+def by_idempotency_keys(keys):
+    # $exists lets the planner use the partial unique index
+    return {"idempotency_key": {"$in": list(keys), "$exists": True}}
+
+def client_by_id(client_id):
+    return {"client_id": client_id}
+
+def course_by_id(course_id):
+    return {"course_id": course_id}
+
+# ------------------ AGENT JOB QUERIES ------------------
+# utils/job_queue.py: claiming, per-session ordering and lease expiry
+
+JOB_STATUSES_ACTIVE = ["queued", "running"]
+# highest lane first (0 = high), then oldest
+JOB_CLAIM_SORT = [("lane", 1), ("created_at", 1)]
+JOB_SEQ_SORT = [("seq", 1)]
+
+def claimable_jobs(lanes):
+    # seq None: inserted but not yet numbered, see JobQueue.submit
+    return {"status": "queued", "lane": {"$in": list(lanes)}, "seq": {"$ne": None}}
+
+def unsequenced_jobs(before):
+    return {"status": "queued", "seq": None, "created_at": {"$lt": before}}
+
+def unfinished_jobs(session_id):
+    return {"session_id": session_id, "status": {"$in": JOB_STATUSES_ACTIVE}}
+
+def expired_job_leases(now):
+    return {"status": "running", "lease_until": {"$lt": now}}
+
+def job_session(session_id):
+    return {"_id": session_id}
+
+def active_jobs_pipeline():
+    return [
+        {"$match": {"status": {"$in": JOB_STATUSES_ACTIVE}}},
+        {"$group": {"_id": {"status": "$status", "lane": "$lane"}, "count": {"$sum": 1}}},
+    ]
+
+# ---------------- DASHBOARD AGENT QUERIES ------------------
+# dashboard figures are read from the rollup collections in tools/rollups.py
+
+def totals_filter():
+    return {"_id": rollups.TOTALS_ID}
+
+def totals_value(doc, key):
+    return (doc or {}).get(key, 0)
+
+def client_counts(doc):
+    return {"active": totals_value(doc, "active"), "inactive": totals_value(doc, "inactive")}
+
+def current_month_filter():
+    return {"_id": rollups.month_key(datetime.utcnow())}
+
+def new_clients_this_month(doc):
+    return {"new_clients_this_month": totals_value(doc, "new_clients")}
+
+def daily_revenue_filter(days):
+    return {"_id": {"$gte": rollups.day_key(datetime.utcnow() - timedelta(days=days - 1))}}
+
+DAILY_REVENUE_SORT = [("_id", 1)]
+
+def daily_revenue(docs):
+    return [{"date": doc["_id"], "revenue": doc["revenue"], "payments": doc["payments"]} for doc in docs]
+
+def enrollment_trends_pipeline():
+    return [
+        {"$sort": {"orders": -1}},
+        {"$project": {"count": "$orders"}}
+    ]
+
+def top_services_pipeline():
+    return [
+        {"$sort": {"revenue": -1}},
+        {"$limit": 5},
+        {"$project": {"total": "$revenue"}}
+    ]
+
+def course_completion_pipeline():
+    return [
+        {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+    ]
+
+# class names repeat (every "Morning Yoga" session is its own class), so a
+# name selects all of them; a class_id selects exactly one
+def class_attendance_filter(class_ref):
+    return {"$or": [{"class": class_ref}, {"_id": class_ref}]}
+
+def class_by_name(class_ref):
+    return {"$or": [{"name": class_ref}, {"class_id": class_ref}]}
+
+def attendance_percentage(class_name, total_records, attended):
+    if total_records == 0:
+        return {"class": class_name, "attendance_percentage": 0}
+    percentage = (attended / total_records) * 100
+    return {"class": class_name, "attendance_percentage": round(percentage, 2)}
+
+def class_attendance(class_ref, docs):
+    """Attendance over every rollup row matching class_ref, with how many classes it covers"""
+    docs = list(docs)
+    result = attendance_percentage(class_ref, sum(doc["total"] for doc in docs), sum(doc["attended"] for doc in docs))
+    result["classes"] = len(docs)
+    return result
+
+# ------------------ COMBINED KPI QUERY ------------------
+
+def kpi_pipeline():
+    """
+    Every headline dashboard metric in one aggregate over the rollups, run
+    against rollup_totals. $unionWith folds in this month's client rollup
+    and the per-class attendance rollup; $facet splits them back apart.
+    """
+    month = rollups.month_key(datetime.utcnow())
+    return [
+        {"$match": totals_filter()},
+        {"$unionWith": {"coll": "rollup_monthly_clients", "pipeline": [
+            {"$match": {"_id": month}}
+        ]}},
+        {"$unionWith": {"coll": "rollup_class_attendance", "pipeline": [
+            {"$sort": {"_id": 1}},
+            {"$set": {"class_id": "$_id", "_id": "attendance"}}
+        ]}},
+        {"$facet": {
+            "totals": [{"$match": totals_filter()}],
+            "month": [{"$match": {"_id": month}}],
+            "attendance": [{"$match": {"_id": "attendance"}}]
+        }}
+    ]
+
+def kpi_summary(result):
+    facets = result[0] if result else {}
+    totals = (facets.get("totals") or [None])[0]
+    month = (facets.get("month") or [None])[0]
+    attendance = []
+    for doc in facets.get("attendance", []):
+        entry = attendance_percentage(doc.get("class"), doc["total"], doc["attended"])
+        entry.update({"class_id": doc["class_id"], "total": doc["total"], "attended": doc["attended"]})
+        attendance.append(entry)
+    return {
+        "total_revenue": totals_value(totals, "revenue"),
+        "outstanding_payments": totals_value(totals, "outstanding"),
+        "clients": client_counts(totals),
+        "new_clients_this_month": totals_value(month, "new_clients"),
+        "attendance": attendance
+    }
@@ -1,112 +1,339 @@
-from models.database import sync_db
-from datetime import datetime
-from collections import Counter
-from pymongo import DESCENDING
-from bson.regex import Regex
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from models.database import connections
+from tools import mongo_queries as q
+from utils.cache import analytics_cache, ANALYTICS_CACHE_TTL, MISSING
+from utils.timing import instrument, in_context
+from utils import pagination
 
+
+def metric_ttl(metric, default=ANALYTICS_CACHE_TTL):
+    return float(os.getenv(f"ANALYTICS_TTL_{metric.upper()}", default))
+
+# metric -> (ttl seconds, collections it is computed from); writes to a
+# collection invalidate every metric tagged with it
+CACHED_METRICS = {
+    "get_dashboard_kpis": (metric_ttl("get_dashboard_kpis"), ("clients", "payments", "orders", "attendance", "classes")),
+    "get_total_revenue": (metric_ttl("get_total_revenue"), ("payments",)),
+    "get_outstanding_payments": (metric_ttl("get_outstanding_payments"), ("orders",)),
+    "count_active_inactive_clients": (metric_ttl("count_active_inactive_clients"), ("clients",)),
+    "get_new_clients_this_month": (metric_ttl("get_new_clients_this_month", 60), ("clients",)),
+    "get_daily_revenue": (metric_ttl("get_daily_revenue"), ("payments",)),
+    "get_enrollment_trends": (metric_ttl("get_enrollment_trends"), ("orders",)),
+    "get_top_services": (metric_ttl("get_top_services"), ("orders",)),
+    "get_course_completion_rates": (metric_ttl("get_course_completion_rates"), ("courses",)),
+    "get_attendance_percentage": (metric_ttl("get_attendance_percentage"), ("classes", "attendance")),
+}
+
+# short names accepted by get_metrics -> dashboard method; "name:arg" passes one argument
+BATCH_METRICS = {
+    "kpis": "get_dashboard_kpis",
+    "total_revenue": "get_total_revenue",
+    "daily_revenue": "get_daily_revenue",
+    "outstanding_payments": "get_outstanding_payments",
+    "client_counts": "count_active_inactive_clients",
+    "new_clients_this_month": "get_new_clients_this_month",
+    "enrollment_trends": "get_enrollment_trends",
+    "top_services": "get_top_services",
+    "course_completion_rates": "get_course_completion_rates",
+    "attendance_percentage": "get_attendance_percentage",
+}
+METRIC_BATCH_WORKERS = int(os.getenv("METRIC_BATCH_WORKERS", "8"))
+batch_executor = ThreadPoolExecutor(max_workers=METRIC_BATCH_WORKERS, thread_name_prefix="metrics")
+
+def parse_metric_requests(names):
+    """["top_services", "attendance_percentage:Morning Yoga"] -> [(label, method, args)]"""
+    parsed = []
+    for raw in names:
+        name, _, arg = raw.strip().partition(":")
+        name, arg = name.strip().lower(), arg.strip()
+        if not name:
+            continue
+        method = BATCH_METRICS.get(name)
+        if not method:
+            raise ValueError(f"Unknown metric '{name}'. Choose from: {', '.join(BATCH_METRICS)}")
+        args = ()
+        if arg:
+            args = (int(arg),) if name == "daily_revenue" else (arg,)
+        parsed.append((raw.strip(), method, args))
+    return parsed
+
+def cached(metric, compute, *args):
+    ttl, tags = CACHED_METRICS[metric]
+    return analytics_cache.get_or_set((metric,) + args, compute, ttl, tags)
+
+async def acached(metric, compute, *args):
+    ttl, tags = CACHED_METRICS[metric]
+    return await analytics_cache.aget_or_set((metric,) + args, compute, ttl, tags)
+
+def cached_kpis():
+    """Live get_dashboard_kpis result, which per-metric methods answer from"""
+    kpis = analytics_cache.peek(("get_dashboard_kpis",))
+    return None if kpis is MISSING else kpis
+
+def kpi_attendance(class_ref):
+    entries = [entry for entry in (cached_kpis() or {}).get("attendance", [])
+               if class_ref in (entry["class"], entry["class_id"])]
+    return q.class_attendance(class_ref, entries) if entries else None
+
+
+@instrument("mongo")
 class MongoDBTool:
-    def __init__(self):
-        self.db = sync_db
+    # clients are resolved on use so importing the tools opens no connections
+    @property
+    def db(self):
+        return connections.sync_db
+
+    # dashboard reads honour DASHBOARD_READ_PREFERENCE
+    @property
+    def analytics(self):
+        return connections.dashboard_db
 
     # ------------------ SUPPORT AGENT METHODS ------------------
 
-    def search_clients(self, name=None, email=None, phone=None):
-        query = {}
-        if name:
-            query["name"] = {"$regex": Regex(name, "i")}
-        if email:
-            query["email"] = {"$regex": Regex(email, "i")}
-        if phone:
-            query["phone"] = {"$regex": Regex(phone, "i")}
-        return list(self.db.clients.find(query).limit(20))
+    # list methods return {"items": [...], "next_token": ...}; pass next_token
+    # back as page_token for the following page
+
+    def search_clients(self, name=None, email=None, phone=None, limit=q.LIST_LIMIT, page_token=None):
+        """
+        Name words and email match as prefixes (the start of the address, not
+        its domain); phone matches the start of the national number, with or
+        without a +1/001 country code.
+        """
+        return self._page("search_clients", (name, email, phone), limit, page_token)
 
-    def get_orders_by_client(self, client_id):
-        return list(self.db.orders.find({"client_id": client_id}).limit(20))
+    def get_orders_by_client(self, client_id, limit=q.LIST_LIMIT, page_token=None):
+        return self._page("get_orders_by_client", (client_id,), limit, page_token)
 
     def get_order_by_id(self, order_id):
-        return self.db.orders.find_one({"order_id": order_id})
+        return self.db.orders.find_one(q.order_by_id(order_id), q.ORDER_FIELDS)
 
-    def filter_orders_by_status(self, status):
-        return list(self.db.orders.find({"status": status}).limit(20))
+    def filter_orders_by_status(self, status, limit=q.LIST_LIMIT, page_token=None):
+        return self._page("filter_orders_by_status", (status,), limit, page_token)
 
     def get_payment_details(self, order_id):
-        return self.db.payments.find_one({"order_id": order_id})
+        return self.db.payments.find_one(q.payment_by_order(order_id), q.PAYMENT_FIELDS)
 
     def calculate_pending_dues(self, client_id):
-        orders = self.db.orders.find({"client_id": client_id, "status": "pending"})
-        pending_dues = sum(order.get("amount", 0) for order in orders)
-        return {"client_id": client_id, "pending_dues": pending_dues}
+        orders = self.db.orders.find(q.pending_orders_by_client(client_id), q.AMOUNT_FIELDS)
+        return q.pending_dues(client_id, orders)
 
-    def list_upcoming_classes(self):
-        now = datetime.now()
-        return list(self.db.classes.find({"date": {"$gte": now}}).sort("date", 1).limit(20))
+    def list_upcoming_classes(self, limit=q.LIST_LIMIT, page_token=None):
+        return self._page("list_upcoming_classes", (), limit, page_token)
 
-    def filter_classes_by_instructor(self, instructor):
-        return list(self.db.classes.find({
-            "instructor": {"$regex": Regex(instructor, "i")}
-        }).limit(20))
+    def filter_classes_by_instructor(self, instructor, limit=q.LIST_LIMIT, page_token=None):
+        return self._page("filter_classes_by_instructor", (instructor,), limit, page_token)
+
+    def _page(self, name, args, limit, page_token):
+        collection, build, fields, sort = q.LIST_QUERIES[name]
+        limit = pagination.page_size(limit)
+        cursor = self.db[collection].find(pagination.after(build(*args), sort, page_token), fields)
+        return pagination.page(list(cursor.sort(sort).limit(limit + 1)), sort, limit)
 
     # ---------------- DASHBOARD AGENT METHODS ------------------
 
+    def get_metrics(self, names):
+        """Run several dashboard metrics concurrently and return them keyed by name"""
+        futures = {label: batch_executor.submit(in_context(getattr(self, method)), *args)
+                   for label, method, args in parse_metric_requests(names)}
+        results = {}
+        for label, future in futures.items():
+            try:
+                results[label] = future.result()
+            except Exception as e:
+                results[label] = {"error": str(e)}
+        return results
+
+    def get_dashboard_kpis(self):
+        return cached("get_dashboard_kpis", lambda: q.kpi_summary(list(self.analytics.rollup_totals.aggregate(q.kpi_pipeline()))))
+
     def get_total_revenue(self):
-        pipeline = [
-            {"$group": {"_id": None, "total": {"$sum": "$amount"}}}
-        ]
-        result = list(self.db.payments.aggregate(pipeline))
-        return result[0]["total"] if result else 0
+        kpis = cached_kpis()
+        if kpis:
+            return kpis["total_revenue"]
+        return cached("get_total_revenue", lambda: q.totals_value(
+            self.analytics.rollup_totals.find_one(q.totals_filter()), "revenue"))
 
     def get_outstanding_payments(self):
-        pipeline = [
-            {"$match": {"status": "pending"}},
-            {"$group": {"_id": None, "outstanding": {"$sum": "$amount"}}}
-        ]
-        result = list(self.db.orders.aggregate(pipeline))
-        return result[0]["outstanding"] if result else 0
+        kpis = cached_kpis()
+        if kpis:
+            return kpis["outstanding_payments"]
+        return cached("get_outstanding_payments", lambda: q.totals_value(
+            self.analytics.rollup_totals.find_one(q.totals_filter()), "outstanding"))
 
     def count_active_inactive_clients(self):
-        active = self.db.clients.count_documents({"status": "active"})
-        inactive = self.db.clients.count_documents({"status": "inactive"})
-        return {"active": active, "inactive": inactive}
+        kpis = cached_kpis()
+        if kpis:
+            return dict(kpis["clients"])
+        return cached("count_active_inactive_clients", lambda: q.client_counts(
+            self.analytics.rollup_totals.find_one(q.totals_filter())))
 
     def get_new_clients_this_month(self):
-        now = datetime.now()
-        first_day = datetime(now.year, now.month, 1)
-        count = self.db.clients.count_documents({"registration_date": {"$gte": first_day}})
-        return {"new_clients_this_month": count}
+        kpis = cached_kpis()
+        if kpis:
+            return {"new_clients_this_month": kpis["new_clients_this_month"]}
+        return cached("get_new_clients_this_month", lambda: q.new_clients_this_month(
+            self.analytics.rollup_monthly_clients.find_one(q.current_month_filter())))
+
+    def get_daily_revenue(self, days=30):
+        return cached("get_daily_revenue", lambda: q.daily_revenue(
+            self.analytics.rollup_daily_revenue.find(q.daily_revenue_filter(days)).sort(q.DAILY_REVENUE_SORT)), days)
 
     def get_enrollment_trends(self):
-        pipeline = [
-            {"$group": {"_id": "$service_name", "count": {"$sum": 1}}},
-            {"$sort": {"count": -1}}
-        ]
-        return list(self.db.orders.aggregate(pipeline))
+        return cached("get_enrollment_trends", lambda: list(self.analytics.rollup_services.aggregate(q.enrollment_trends_pipeline())))
 
     def get_top_services(self):
-        pipeline = [
-            {"$group": {"_id": "$service_name", "total": {"$sum": "$amount"}}},
-            {"$sort": {"total": -1}},
-            {"$limit": 5}
-        ]
-        return list(self.db.orders.aggregate(pipeline))
+        return cached("get_top_services", lambda: list(self.analytics.rollup_services.aggregate(q.top_services_pipeline())))
 
     def get_course_completion_rates(self):
-        pipeline = [
-            {"$group": {"_id": "$status", "count": {"$sum": 1}}}
-        ]
-        return list(self.db.courses.aggregate(pipeline))
+        return cached("get_course_completion_rates", lambda: list(self.analytics.courses.aggregate(q.course_completion_pipeline())))
 
     def get_attendance_percentage(self, class_name):
-        class_doc = self.db.classes.find_one({"name": class_name})
-        if not class_doc:
+        """Attendance over every class with this name, or the one class with this class_id"""
+        from_kpis = kpi_attendance(class_name)
+        if from_kpis:
+            return from_kpis
+        return cached("get_attendance_percentage", lambda: self._attendance_percentage(class_name), class_name)
+
+    def _attendance_percentage(self, class_name):
+        docs = list(self.analytics.rollup_class_attendance.find(q.class_attendance_filter(class_name)))
+        if docs:
+            return q.class_attendance(class_name, docs)
+        if not self.analytics.classes.find_one(q.class_by_name(class_name), {"_id": 1}):
             return {"error": "Class not found"}
-        
-        class_id = class_doc["class_id"]
-        total_records = self.db.attendance.count_documents({"class_id": class_id})
-        attended = self.db.attendance.count_documents({"class_id": class_id, "attended": True})
-        
-        if total_records == 0:
-            return {"class": class_name, "attendance_percentage": 0}
-        
-        percentage = (attended / total_records) * 100
-        return {"class": class_name, "attendance_percentage": round(percentage, 2)}
+        return q.attendance_percentage(class_name, 0, 0)
+
+
+@instrument("mongo")
+class AsyncMongoDBTool:
+    """Motor-backed twin of MongoDBTool for the async FastAPI routes."""
+
+    @property
+    def db(self):
+        return connections.async_db
+
+    @property
+    def analytics(self):
+        return connections.async_dashboard_db
+
+    # ------------------ SUPPORT AGENT METHODS ------------------
+
+    async def search_clients(self, name=None, email=None, phone=None, limit=q.LIST_LIMIT, page_token=None):
+        return await self._page("search_clients", (name, email, phone), limit, page_token)
+
+    async def get_orders_by_client(self, client_id, limit=q.LIST_LIMIT, page_token=None):
+        return await self._page("get_orders_by_client", (client_id,), limit, page_token)
+
+    async def get_order_by_id(self, order_id):
+        return await self.db.orders.find_one(q.order_by_id(order_id), q.ORDER_FIELDS)
+
+    async def filter_orders_by_status(self, status, limit=q.LIST_LIMIT, page_token=None):
+        return await self._page("filter_orders_by_status", (status,), limit, page_token)
+
+    async def get_payment_details(self, order_id):
+        return await self.db.payments.find_one(q.payment_by_order(order_id), q.PAYMENT_FIELDS)
+
+    async def calculate_pending_dues(self, client_id):
+        orders = await self.db.orders.find(q.pending_orders_by_client(client_id), q.AMOUNT_FIELDS).to_list(None)
+        return q.pending_dues(client_id, orders)
+
+    async def list_upcoming_classes(self, limit=q.LIST_LIMIT, page_token=None):
+        return await self._page("list_upcoming_classes", (), limit, page_token)
+
+    async def filter_classes_by_instructor(self, instructor, limit=q.LIST_LIMIT, page_token=None):
+        return await self._page("filter_classes_by_instructor", (instructor,), limit, page_token)
+
+    async def _page(self, name, args, limit, page_token):
+        collection, build, fields, sort = q.LIST_QUERIES[name]
+        limit = pagination.page_size(limit)
+        cursor = self.db[collection].find(pagination.after(build(*args), sort, page_token), fields)
+        return pagination.page(await cursor.sort(sort).limit(limit + 1).to_list(limit + 1), sort, limit)
+
+    async def export(self, name, *args):
+        """Yield every row of a list query in keyset order, one server batch in memory at a time"""
+        collection, build, fields, sort = q.LIST_QUERIES[name]
+        cursor = self.db[collection].find(build(*args), fields).sort(sort).batch_size(q.EXPORT_BATCH_SIZE)
+        async for doc in cursor:
+            yield doc
+
+    # ---------------- DASHBOARD AGENT METHODS ------------------
+
+    async def get_metrics(self, names):
+        """Run several dashboard metrics concurrently and return them keyed by name"""
+        parsed = parse_metric_requests(names)
+        outcomes = await asyncio.gather(
+            *(getattr(self, method)(*args) for _, method, args in parsed), return_exceptions=True)
+        return {label: ({"error": str(outcome)} if isinstance(outcome, Exception) else outcome)
+                for (label, _, _), outcome in zip(parsed, outcomes)}
+
+    async def get_dashboard_kpis(self):
+        async def compute():
+            return q.kpi_summary(await self.analytics.rollup_totals.aggregate(q.kpi_pipeline()).to_list(None))
+        return await acached("get_dashboard_kpis", compute)
+
+    async def get_total_revenue(self):
+        kpis = cached_kpis()
+        if kpis:
+            return kpis["total_revenue"]
+        async def compute():
+            return q.totals_value(await self.analytics.rollup_totals.find_one(q.totals_filter()), "revenue")
+        return await acached("get_total_revenue", compute)
+
+    async def get_outstanding_payments(self):
+        kpis = cached_kpis()
+        if kpis:
+            return kpis["outstanding_payments"]
+        async def compute():
+            return q.totals_value(await self.analytics.rollup_totals.find_one(q.totals_filter()), "outstanding")
+        return await acached("get_outstanding_payments", compute)
+
+    async def count_active_inactive_clients(self):
+        kpis = cached_kpis()
+        if kpis:
+            return dict(kpis["clients"])
+        async def compute():
+            return q.client_counts(await self.analytics.rollup_totals.find_one(q.totals_filter()))
+        return await acached("count_active_inactive_clients", compute)
+
+    async def get_new_clients_this_month(self):
+        kpis = cached_kpis()
+        if kpis:
+            return {"new_clients_this_month": kpis["new_clients_this_month"]}
+        async def compute():
+            return q.new_clients_this_month(await self.analytics.rollup_monthly_clients.find_one(q.current_month_filter()))
+        return await acached("get_new_clients_this_month", compute)
+
+    async def get_daily_revenue(self, days=30):
+        async def compute():
+            cursor = self.analytics.rollup_daily_revenue.find(q.daily_revenue_filter(days)).sort(q.DAILY_REVENUE_SORT)
+            return q.daily_revenue(await cursor.to_list(None))
+        return await acached("get_daily_revenue", compute, days)
+
+    async def get_enrollment_trends(self):
+        async def compute():
+            return await self.analytics.rollup_services.aggregate(q.enrollment_trends_pipeline()).to_list(None)
+        return await acached("get_enrollment_trends", compute)
+
+    async def get_top_services(self):
+        async def compute():
+            return await self.analytics.rollup_services.aggregate(q.top_services_pipeline()).to_list(None)
+        return await acached("get_top_services", compute)
+
+    async def get_course_completion_rates(self):
+        async def compute():
+            return await self.analytics.courses.aggregate(q.course_completion_pipeline()).to_list(None)
+        return await acached("get_course_completion_rates", compute)
 
+    async def get_attendance_percentage(self, class_name):
+        from_kpis = kpi_attendance(class_name)
+        if from_kpis:
+            return from_kpis
+        async def compute():
+            docs = await self.analytics.rollup_class_attendance.find(q.class_attendance_filter(class_name)).to_list(None)
+            if docs:
+                return q.class_attendance(class_name, docs)
+            if not await self.analytics.classes.find_one(q.class_by_name(class_name), {"_id": 1}):
+                return {"error": "Class not found"}
+            return q.attendance_percentage(class_name, 0, 0)
+        return await acached("get_attendance_percentage", compute, class_name)
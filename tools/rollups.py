@@ -0,0 +1,135 @@
+"""
+Materialized dashboard rollups.
+
+rollup_totals            single "totals" doc: revenue, outstanding, active, inactive
+rollup_daily_revenue     one doc per payment day ("YYYY-MM-DD"): revenue, payments
+rollup_services          one doc per service name: orders, revenue
+rollup_class_attendance  one doc per class_id: class, total, attended
+rollup_monthly_clients   one doc per registration month ("YYYY-MM"): new_clients
+
+ExternalAPITool keeps them current with $inc upserts as it writes;
+rebuild_rollups() recomputes all of them from the raw collections.
+"""
+from datetime import datetime
+from pymongo import UpdateOne
+
+TOTALS_ID = "totals"
+
+ROLLUP_COLLECTIONS = [
+    "rollup_totals",
+    "rollup_daily_revenue",
+    "rollup_services",
+    "rollup_class_attendance",
+    "rollup_monthly_clients",
+]
+
+def day_key(value: datetime) -> str:
+    return value.strftime("%Y-%m-%d")
+
+def month_key(value: datetime) -> str:
+    return value.strftime("%Y-%m")
+
+# ------------------ FULL REBUILD ------------------
+
+# (source collection, pipeline) per rollup; each pipeline ends in $out so
+# the target is swapped in atomically and keeps its indexes
+REBUILD_PIPELINES = [
+    ("clients", [
+        {"$group": {
+            "_id": TOTALS_ID,
+            "active": {"$sum": {"$cond": [{"$eq": ["$status", "active"]}, 1, 0]}},
+            "inactive": {"$sum": {"$cond": [{"$eq": ["$status", "inactive"]}, 1, 0]}}
+        }},
+        {"$unionWith": {"coll": "payments", "pipeline": [
+            {"$group": {"_id": TOTALS_ID, "revenue": {"$sum": "$amount"}}}
+        ]}},
+        {"$unionWith": {"coll": "orders", "pipeline": [
+            {"$match": {"status": "pending"}},
+            {"$group": {"_id": TOTALS_ID, "outstanding": {"$sum": "$amount"}}}
+        ]}},
+        {"$group": {
+            "_id": TOTALS_ID,
+            "revenue": {"$sum": "$revenue"},
+            "outstanding": {"$sum": "$outstanding"},
+            "active": {"$sum": "$active"},
+            "inactive": {"$sum": "$inactive"}
+        }},
+        {"$out": "rollup_totals"}
+    ]),
+    ("payments", [
+        {"$group": {
+            "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$payment_date"}},
+            "revenue": {"$sum": "$amount"},
+            "payments": {"$sum": 1}
+        }},
+        {"$out": "rollup_daily_revenue"}
+    ]),
+    ("orders", [
+        {"$group": {"_id": "$service_name", "orders": {"$sum": 1}, "revenue": {"$sum": "$amount"}}},
+        {"$out": "rollup_services"}
+    ]),
+    ("attendance", [
+        {"$group": {
+            "_id": "$class_id",
+            "total": {"$sum": 1},
+            "attended": {"$sum": {"$cond": ["$attended", 1, 0]}}
+        }},
+        {"$lookup": {"from": "classes", "localField": "_id", "foreignField": "class_id", "as": "class"}},
+        {"$set": {"class": {"$arrayElemAt": ["$class.name", 0]}}},
+        {"$out": "rollup_class_attendance"}
+    ]),
+    ("clients", [
+        {"$group": {
+            "_id": {"$dateToString": {"format": "%Y-%m", "date": "$registration_date"}},
+            "new_clients": {"$sum": 1}
+        }},
+        {"$out": "rollup_monthly_clients"}
+    ]),
+]
+
+def rebuild_rollups(db):
+    """Recompute every rollup from the raw collections (sync pymongo db)"""
+    for source, pipeline in REBUILD_PIPELINES:
+        db[source].aggregate(pipeline)
+    # $out writes nothing for an empty source, so make sure totals exist
+    db.rollup_totals.update_one({"_id": TOTALS_ID}, {"$setOnInsert": {
+        "revenue": 0, "outstanding": 0, "active": 0, "inactive": 0
+    }}, upsert=True)
+
+def ensure_rollups(db):
+    """Build the rollups once if this database has never had them"""
+    if db.rollup_totals.find_one({"_id": TOTALS_ID}, {"_id": 1}) is None:
+        rebuild_rollups(db)
+        return True
+    return False
+
+# ------------------ INCREMENTAL UPDATES ------------------
+
+async def record_client(db, client: dict, session=None):
+    """Apply a newly inserted client to the rollups (motor db)"""
+    await db.rollup_monthly_clients.update_one(
+        {"_id": month_key(client["registration_date"])}, {"$inc": {"new_clients": 1}}, upsert=True, session=session)
+    await db.rollup_totals.update_one(
+        {"_id": TOTALS_ID}, {"$inc": {client["status"]: 1}}, upsert=True, session=session)
+
+async def record_order(db, order: dict, session=None):
+    """Apply a newly inserted order to the rollups (motor db)"""
+    await record_orders(db, [order], session)
+
+async def record_orders(db, orders: list, session=None):
+    """Apply a batch of inserted orders with one $inc per touched rollup doc (motor db)"""
+    services = {}
+    outstanding = 0
+    for order in orders:
+        counts = services.setdefault(order["service_name"], {"orders": 0, "revenue": 0})
+        counts["orders"] += 1
+        counts["revenue"] += order["amount"]
+        if order["status"] == "pending":
+            outstanding += order["amount"]
+    if services:
+        await db.rollup_services.bulk_write(
+            [UpdateOne({"_id": name}, {"$inc": counts}, upsert=True) for name, counts in services.items()],
+            ordered=False, session=session)
+    if outstanding:
+        await db.rollup_totals.update_one(
+            {"_id": TOTALS_ID}, {"$inc": {"outstanding": outstanding}}, upsert=True, session=session)
@@ -0,0 +1,65 @@
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from utils.timing import in_context
+
+AGENT_MAX_CONCURRENCY = int(os.getenv("AGENT_MAX_CONCURRENCY", "4"))
+AGENT_MAX_QUEUE = int(os.getenv("AGENT_MAX_QUEUE", "16"))
+
+
+class AgentQueueFull(Exception):
+    """Raised when every worker is busy and the wait queue is full."""
+
+
+class AgentRunner:
+    """
+    Runs blocking crew work (memory, translation, kickoff) on a bounded
+    thread pool so the event loop stays free for the other routes.
+    At most max_workers runs execute at once, and at most max_queue more
+    may wait; anything beyond that is rejected with AgentQueueFull.
+    """
+
+    def __init__(self, max_workers: int = AGENT_MAX_CONCURRENCY, max_queue: int = AGENT_MAX_QUEUE):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="agent")
+        self.pending = 0
+
+    @property
+    def capacity(self):
+        return self.max_workers + self.max_queue
+
+    def _release(self, _future):
+        self.pending -= 1
+
+    def submit(self, fn, *args, **kwargs):
+        """Schedule fn on the pool and return an awaitable; raises AgentQueueFull right away"""
+        if self.pending >= self.capacity:
+            raise AgentQueueFull(f"Agent queue is full ({self.pending}/{self.capacity} runs pending)")
+
+        loop = asyncio.get_running_loop()
+        self.pending += 1
+        # the worker inherits the request's context, and with it the request's trace
+        future = loop.run_in_executor(self.executor, in_context(functools.partial(fn, *args, **kwargs)))
+        # release the slot when the thread finishes, even if the client went away
+        future.add_done_callback(self._release)
+        return future
+
+    async def run(self, fn, *args, **kwargs):
+        return await self.submit(fn, *args, **kwargs)
+
+    def stats(self):
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "pending": self.pending,
+            "running": min(self.pending, self.max_workers),
+            "queued": max(self.pending - self.max_workers, 0),
+        }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+agent_runner = AgentRunner()
@@ -0,0 +1,130 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+ANALYTICS_CACHE_SIZE = int(os.getenv("ANALYTICS_CACHE_SIZE", "256"))
+ANALYTICS_CACHE_TTL = float(os.getenv("ANALYTICS_CACHE_TTL", "300"))
+
+MISSING = object()
+
+
+class TTLCache:
+    """
+    Size-bounded LRU cache with a TTL per entry. Entries carry tags (the
+    collections they were computed from) so a write can drop exactly the
+    entries it makes stale. Safe to share between threads.
+    """
+
+    def __init__(self, maxsize: int = ANALYTICS_CACHE_SIZE, default_ttl: float = ANALYTICS_CACHE_TTL):
+        self.maxsize = maxsize
+        self.default_ttl = default_ttl
+        self.entries = OrderedDict()  # key -> (expires_at, tags, value)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def peek(self, key):
+        """Return a live value without touching LRU order or counters"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                return entry[2]
+            return MISSING
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return MISSING
+            if entry[0] <= time.monotonic():
+                del self.entries[key]
+                self.misses += 1
+                return MISSING
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def set(self, key, value, ttl: float = None, tags=()):
+        expires_at = time.monotonic() + (self.default_ttl if ttl is None else ttl)
+        with self.lock:
+            self.entries[key] = (expires_at, frozenset(tags), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def items(self):
+        """Snapshot of live (key, value) pairs"""
+        now = time.monotonic()
+        with self.lock:
+            return [(key, entry[2]) for key, entry in self.entries.items() if entry[0] > now]
+
+    def get_or_set(self, key, compute, ttl: float = None, tags=()):
+        value = self.get(key)
+        if value is MISSING:
+            value = compute()
+            self.set(key, value, ttl, tags)
+        return value
+
+    async def aget_or_set(self, key, compute, ttl: float = None, tags=()):
+        value = self.get(key)
+        if value is MISSING:
+            value = await compute()
+            self.set(key, value, ttl, tags)
+        return value
+
+    def invalidate(self, *tags):
+        """Drop every entry computed from any of the given tags"""
+        tags = set(tags)
+        with self.lock:
+            stale = [key for key, entry in self.entries.items() if entry[1] & tags]
+            for key in stale:
+                del self.entries[key]
+            self.invalidations += len(stale)
+        return len(stale)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self.entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+analytics_cache = TTLCache()
+
+# bumped on every application write; caches of whole agent answers key on it
+_data_version = 0
+_version_lock = threading.Lock()
+_write_listeners = []
+
+def data_version() -> int:
+    return _data_version
+
+def on_write(listener):
+    """Register listener(collections) to run after every record_write"""
+    _write_listeners.append(listener)
+    return listener
+
+def record_write(*collections):
+    """Call after writing to collections: drops stale analytics and bumps the data version"""
+    global _data_version
+    with _version_lock:
+        _data_version += 1
+    analytics_cache.invalidate(*collections)
+    for listener in _write_listeners:
+        listener(collections)
@@ -0,0 +1,73 @@
+"""
+Compact, size-bounded rendering of tool results for the LLM context.
+"""
+import json
+import os
+from datetime import datetime, date
+from decimal import Decimal
+from bson import ObjectId
+
+# ~4 characters per token, so the default keeps an observation under ~500 tokens
+TOOL_OUTPUT_CHARS = int(os.getenv("TOOL_OUTPUT_CHARS", "2000"))
+
+
+def _plain(value):
+    """Reduce BSON/Python values to short JSON-friendly scalars"""
+    if isinstance(value, dict):
+        # internal ObjectIds mean nothing to the model; string/grouped _ids are kept
+        return {key: _plain(item) for key, item in value.items()
+                if item is not None and not isinstance(item, ObjectId)}
+    if isinstance(value, (list, tuple)):
+        return [_plain(item) for item in value]
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M") if (value.hour or value.minute) else value.strftime("%Y-%m-%d")
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, float):
+        return round(value, 2)
+    if isinstance(value, (str, int, bool)) or value is None:
+        return value
+    return str(value)
+
+def _dumps(value):
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+
+def compact(result, budget: int = TOOL_OUTPUT_CHARS) -> str:
+    """
+    Render a tool result as compact JSON within budget characters.
+    Lists become one object per line; items that don't fit are replaced by a
+    "+N more" summary so the model knows the answer was cut.
+    """
+    if result is None or result == []:
+        return "No results found."
+
+    if not isinstance(result, (list, tuple)):
+        text = _dumps(_plain(result))
+        return text if len(text) <= budget else text[:budget - 15] + "...(truncated)"
+
+    lines = []
+    used = 0
+    for index, item in enumerate(result):
+        line = _dumps(_plain(item))
+        remaining = len(result) - index
+        # always leave room for the summary line
+        if used + len(line) + 20 > budget and lines:
+            lines.append(f"+{remaining} more")
+            break
+        if used + len(line) > budget:
+            line = line[:max(budget - used - 35, 0)] + "...(truncated)"
+        lines.append(line)
+        used += len(line) + 1
+    noun = "result" if len(result) == 1 else "results"
+    return f"{len(result)} {noun}:\n" + "\n".join(lines)
+
+
+def compact_page(page: dict, budget: int = TOOL_OUTPUT_CHARS) -> str:
+    """Render a paged list result; the continuation token is kept outside the budget"""
+    text = compact(page["items"], budget)
+    if page.get("next_token"):
+        text += f"\nMore results available: call again with page_token={page['next_token']}"
+    return text
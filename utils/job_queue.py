@@ -0,0 +1,368 @@
+"""
+Background agent jobs.
+
+POST /support/jobs and /dashboard/jobs store a job in the agent_jobs
+collection and return its id straight away. Worker threads in every API
+process claim queued jobs, run them exactly like a synchronous query, and
+write the answer back to the job document. GET /jobs/{job_id} reads it
+from there. A job with a webhook_url is also POSTed to that URL when it
+finishes.
+
+- Lanes: high, normal and low. General workers take the highest lane that
+  has work. JOB_HIGH_WORKERS extra workers only take high jobs, so a
+  backlog of slow normal/low runs never holds up an urgent one.
+- Per session: each job gets its session's next sequence number, and only
+  the session's oldest unfinished job can be claimed. A session's jobs
+  therefore run one at a time, in the order their POSTs returned.
+- A running job's lease is renewed every JOB_LEASE_SECONDS / 3 while its
+  handler runs. A worker that dies stops renewing, and once the lease
+  expires the job is queued again, up to JOB_MAX_ATTEMPTS runs in total.
+- Webhooks go only to public addresses, or to JOB_WEBHOOK_ALLOWED_HOSTS.
+  They are delivered from their own thread pool, so a dead endpoint and
+  its retries never hold up a job worker.
+"""
+import asyncio
+import hashlib
+import hmac
+import ipaddress
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from urllib.parse import urlparse
+import httpx
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from models.database import connections
+from tools import mongo_queries as q
+from utils.timing import start_trace
+
+# worker threads per process taking any lane, and extra ones reserved for the high lane
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_HIGH_WORKERS = int(os.getenv("JOB_HIGH_WORKERS", "1"))
+# idle workers look for new jobs this often; jobs submitted to this process wake them at once
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1"))
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "600"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "2"))
+JOB_WEBHOOK_RETRIES = int(os.getenv("JOB_WEBHOOK_RETRIES", "3"))
+# when set, webhook bodies are signed: X-Job-Signature: sha256=<hex HMAC of the body>
+JOB_WEBHOOK_SECRET = os.getenv("JOB_WEBHOOK_SECRET", "")
+# comma-separated hosts webhooks may target; empty allows any host that resolves to public addresses only
+JOB_WEBHOOK_ALLOWED_HOSTS = {host.strip().lower() for host in os.getenv("JOB_WEBHOOK_ALLOWED_HOSTS", "").split(",")
+                             if host.strip()}
+JOB_WEBHOOK_WORKERS = int(os.getenv("JOB_WEBHOOK_WORKERS", "4"))
+
+LANES = {"high": 0, "normal": 1, "low": 2}
+LANE_NAMES = {lane: name for name, lane in LANES.items()}
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+# longest GET /jobs/{job_id}?wait= long poll
+MAX_WAIT_SECONDS = 30
+# queued jobs a worker looks at per claim; ones waiting behind their session are skipped
+CLAIM_SCAN = 20
+# a job still without a seq this long after its insert lost its submit; _reap numbers it
+SEQ_GRACE_SECONDS = 30
+
+
+def public(job: dict) -> dict:
+    """A job as returned by the API"""
+    out = {
+        "job_id": job["_id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "priority": LANE_NAMES[job["lane"]],
+        "session_id": job["session_id"],
+        "attempts": job.get("attempts", 0),
+        "created_at": job["created_at"],
+        "started_at": job.get("started_at"),
+        "finished_at": job.get("finished_at"),
+        "result": job.get("result"),
+        "error": job.get("error"),
+    }
+    if job.get("webhook"):
+        out["webhook"] = {key: job["webhook"].get(key) for key in ("url", "delivered", "attempts", "error")}
+    return out
+
+def webhook_problem(url: str):
+    """
+    Why url may not be used as a webhook, or None. Without an allow-list
+    every address the host resolves to must be public: no loopback, private,
+    link-local (cloud metadata) or reserved ranges. Blocking (DNS).
+    """
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        return "webhook_url must be an http(s) URL"
+    host = parsed.hostname.lower()
+    if JOB_WEBHOOK_ALLOWED_HOSTS:
+        return None if host in JOB_WEBHOOK_ALLOWED_HOSTS else f"webhook host {host} is not allowed"
+    try:
+        port = parsed.port or (443 if parsed.scheme == "https" else 80)
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, port, proto=socket.IPPROTO_TCP)}
+    except (OSError, ValueError) as e:
+        return f"webhook host {host} does not resolve: {e}"
+    for address in addresses:
+        if not ipaddress.ip_address(address.split("%", 1)[0]).is_global:
+            return f"webhook host {host} resolves to a non-public address"
+    return None
+
+def answer_text(result) -> str:
+    return result["raw"] if isinstance(result, dict) else getattr(result, "raw", str(result))
+
+
+class JobQueue:
+    """Mongo-backed queue of agent runs, shared by every process on the same database."""
+
+    def __init__(self, workers: int = JOB_WORKERS, high_workers: int = JOB_HIGH_WORKERS):
+        self.workers = workers
+        self.high_workers = high_workers
+        self.handlers = {}
+        self.threads = []
+        self.wakeup = threading.Event()
+        self.stopping = threading.Event()
+        self.http = None
+        self.webhook_executor = None
+        self.lock = threading.Lock()
+        self.finished = {DONE: 0, FAILED: 0}
+        self.requeued = 0
+        self.webhooks = {"delivered": 0, "failed": 0}
+
+    def register(self, kind: str, handler):
+        """handler(prompt, session_id) -> agent result; runs on a worker thread"""
+        self.handlers[kind] = handler
+
+    # ------------------ API side (event loop) ------------------
+
+    async def submit(self, kind: str, prompt: str, session_id: str, priority: str = "normal",
+                     webhook_url: str = None, idempotency_key: str = None) -> dict:
+        """Queue a run and return the job; a repeated idempotency_key returns the first job"""
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        if priority not in LANES:
+            raise ValueError(f"priority must be one of {', '.join(LANES)}")
+        if webhook_url:
+            problem = await asyncio.get_running_loop().run_in_executor(None, webhook_problem, webhook_url)
+            if problem:
+                raise ValueError(problem)
+
+        db = connections.async_db
+        if idempotency_key:
+            existing = await db.agent_jobs.find_one(q.by_idempotency_keys([idempotency_key]))
+            if existing:
+                return public(existing)
+
+        now = datetime.utcnow()
+        job = {
+            "_id": uuid.uuid4().hex,
+            "kind": kind,
+            "prompt": prompt,
+            "session_id": session_id,
+            # numbered only after the insert: see below
+            "seq": None,
+            "lane": LANES[priority],
+            "status": QUEUED,
+            "attempts": 0,
+            "created_at": now,
+        }
+        if webhook_url:
+            job["webhook"] = {"url": webhook_url, "delivered": False, "attempts": 0, "error": None}
+        if idempotency_key:
+            job["idempotency_key"] = str(idempotency_key)
+
+        try:
+            await db.agent_jobs.insert_one(job)
+        except DuplicateKeyError:
+            # a concurrent retry won; its sequence number is the one that counts
+            return public(await db.agent_jobs.find_one(q.by_idempotency_keys([job["idempotency_key"]])))
+
+        # The job is in the collection before it takes a number, so any job
+        # holding seq N was inserted before N was handed out. Meanwhile its
+        # null seq sorts first among the session's unfinished jobs and holds
+        # back later ones in _claim, and claimable_jobs skips it.
+        session = await db.agent_job_sessions.find_one_and_update(
+            q.job_session(session_id),
+            {"$inc": {"seq": 1}, "$set": {"updated_at": now}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        job["seq"] = session["seq"]
+        await db.agent_jobs.update_one({"_id": job["_id"], "seq": None}, {"$set": {"seq": job["seq"]}})
+        self.wakeup.set()
+        return public(job)
+
+    async def get(self, job_id: str, wait: float = 0):
+        """The job, or None; with wait, hold the request until it finishes (at most MAX_WAIT_SECONDS)"""
+        deadline = time.monotonic() + min(max(wait, 0), MAX_WAIT_SECONDS)
+        while True:
+            job = await connections.async_db.agent_jobs.find_one({"_id": job_id})
+            if job is None or job["status"] in (DONE, FAILED) or time.monotonic() >= deadline:
+                return public(job) if job else None
+            await asyncio.sleep(min(JOB_POLL_SECONDS, 0.5))
+
+    async def stats(self):
+        lanes = {name: {QUEUED: 0, RUNNING: 0} for name in LANES}
+        async for row in connections.async_db.agent_jobs.aggregate(q.active_jobs_pipeline()):
+            lanes[LANE_NAMES[row["_id"]["lane"]]][row["_id"]["status"]] = row["count"]
+        return {"workers": self.workers, "high_workers": self.high_workers, "lanes": lanes, **self.counters()}
+
+    def counters(self):
+        """This process's totals since start"""
+        with self.lock:
+            return {"finished": dict(self.finished), "requeued": self.requeued, "webhooks": dict(self.webhooks)}
+
+    # ------------------ worker side (threads) ------------------
+
+    def start(self):
+        if self.threads:
+            return
+        # redirects stay off: a public webhook must not bounce the POST to an internal host
+        self.http = httpx.Client(timeout=httpx.Timeout(10.0), follow_redirects=False)
+        self.webhook_executor = ThreadPoolExecutor(max_workers=JOB_WEBHOOK_WORKERS, thread_name_prefix="webhook")
+        lanes = [tuple(LANE_NAMES)] * self.workers + [(LANES["high"],)] * self.high_workers
+        for i, worker_lanes in enumerate(lanes):
+            thread = threading.Thread(target=self._work, args=(worker_lanes,), name=f"job-{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self):
+        """Stop claiming; a job still running is requeued by another process once its lease expires"""
+        self.stopping.set()
+        self.wakeup.set()
+        if self.webhook_executor:
+            self.webhook_executor.shutdown(wait=False)
+
+    def _work(self, lanes):
+        worker = f"{os.getpid()}/{threading.current_thread().name}"
+        while not self.stopping.is_set():
+            try:
+                job = self._claim(lanes, worker)
+                if job is not None:
+                    self._run(job)
+                    continue
+                self._reap()
+            except Exception as e:
+                # e.g. Mongo unreachable; an unfinished job is picked up again when its lease expires
+                print(f"Job queue error: {e}")
+            self.wakeup.wait(JOB_POLL_SECONDS)
+            self.wakeup.clear()
+
+    def _claim(self, lanes, worker):
+        jobs = connections.sync_db.agent_jobs
+        candidates = jobs.find(q.claimable_jobs(lanes), {"_id": 1, "session_id": 1}).sort(q.JOB_CLAIM_SORT).limit(CLAIM_SCAN)
+        for candidate in list(candidates):
+            head = jobs.find_one(q.unfinished_jobs(candidate["session_id"]), {"_id": 1}, sort=q.JOB_SEQ_SORT)
+            if head is None or head["_id"] != candidate["_id"]:
+                continue  # an earlier job of the same session is queued or running
+            now = datetime.utcnow()
+            claimed = jobs.find_one_and_update(
+                {"_id": candidate["_id"], "status": QUEUED},
+                {"$set": {"status": RUNNING, "started_at": now, "worker": worker,
+                          "lease_until": now + timedelta(seconds=JOB_LEASE_SECONDS)},
+                 "$inc": {"attempts": 1}},
+                return_document=ReturnDocument.AFTER,
+            )
+            if claimed:
+                return claimed
+        return None
+
+    def _reap(self):
+        """
+        Requeue, or fail after JOB_MAX_ATTEMPTS, jobs whose worker stopped
+        renewing its lease (see _renew), and number jobs whose submit died
+        between the insert and taking a seq, so they stop blocking their session.
+        """
+        jobs = connections.sync_db.agent_jobs
+        db = connections.sync_db
+        for job in jobs.find(q.unsequenced_jobs(datetime.utcnow() - timedelta(seconds=SEQ_GRACE_SECONDS))):
+            session = db.agent_job_sessions.find_one_and_update(
+                q.job_session(job["session_id"]),
+                {"$inc": {"seq": 1}, "$set": {"updated_at": datetime.utcnow()}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+            # a late submit may number it first; the unused seq only leaves a gap
+            jobs.update_one({"_id": job["_id"], "seq": None}, {"$set": {"seq": session["seq"]}})
+        for job in jobs.find(q.expired_job_leases(datetime.utcnow())):
+            owned = {"_id": job["_id"], "status": RUNNING, "attempts": job["attempts"]}
+            if job["attempts"] >= JOB_MAX_ATTEMPTS:
+                self._finish(job, FAILED, {"error": f"Worker lost after {job['attempts']} attempts"})
+            elif jobs.update_one(owned, {"$set": {"status": QUEUED}, "$unset": {"lease_until": "", "worker": ""}}).modified_count:
+                with self.lock:
+                    self.requeued += 1
+
+    def _run(self, job):
+        # the job id doubles as the trace id, so GET /traces/{job_id} shows where the run went
+        start_trace(job["_id"])
+        done = threading.Event()
+        threading.Thread(target=self._renew, args=(job, done), name=f"lease-{job['_id'][:8]}", daemon=True).start()
+        try:
+            result = self.handlers[job["kind"]](job["prompt"], job["session_id"])
+            status, fields = DONE, {"result": answer_text(result)}
+        except Exception as e:
+            status, fields = FAILED, {"error": str(e)}
+        finally:
+            done.set()
+        self._finish(job, status, fields)
+
+    def _renew(self, job, done):
+        """Heartbeat: keep pushing lease_until forward until the run ends, so only a dead worker's job expires"""
+        owned = {"_id": job["_id"], "status": RUNNING, "attempts": job["attempts"]}
+        while not done.wait(JOB_LEASE_SECONDS / 3):
+            try:
+                lease_until = datetime.utcnow() + timedelta(seconds=JOB_LEASE_SECONDS)
+                if not connections.sync_db.agent_jobs.update_one(owned, {"$set": {"lease_until": lease_until}}).matched_count:
+                    return  # the job was reaped or finished elsewhere
+            except Exception as e:
+                print(f"Job lease renewal failed for {job['_id']}: {e}")
+
+    def _finish(self, job, status: str, fields: dict):
+        # matching attempts keeps a run whose lease expired from overwriting its successor
+        finished = connections.sync_db.agent_jobs.find_one_and_update(
+            {"_id": job["_id"], "status": RUNNING, "attempts": job["attempts"]},
+            {"$set": {"status": status, "finished_at": datetime.utcnow(), **fields},
+             "$unset": {"lease_until": ""}},
+            return_document=ReturnDocument.AFTER,
+        )
+        if finished is None:
+            return
+        with self.lock:
+            self.finished[status] += 1
+        self.wakeup.set()  # the session's next job may be claimable now
+        if finished.get("webhook"):
+            self.webhook_executor.submit(self._deliver, finished)
+
+    def _deliver(self, job):
+        """POST the finished job to its webhook, retrying with backoff; the outcome is kept on the job"""
+        problem = webhook_problem(job["webhook"]["url"])  # again: DNS may have changed since submit
+        if problem:
+            with self.lock:
+                self.webhooks["failed"] += 1
+            connections.sync_db.agent_jobs.update_one({"_id": job["_id"]}, {"$set": {
+                "webhook.delivered": False, "webhook.attempts": 0, "webhook.error": problem}})
+            return
+        body = json.dumps({k: v for k, v in public(job).items() if k != "webhook"}, default=str).encode()
+        headers = {"Content-Type": "application/json", "X-Job-Id": job["_id"]}
+        if JOB_WEBHOOK_SECRET:
+            digest = hmac.new(JOB_WEBHOOK_SECRET.encode(), body, hashlib.sha256).hexdigest()
+            headers["X-Job-Signature"] = f"sha256={digest}"
+
+        error = None
+        for attempt in range(1, JOB_WEBHOOK_RETRIES + 1):
+            try:
+                response = self.http.post(job["webhook"]["url"], content=body, headers=headers)
+                error = None if response.status_code < 300 else f"HTTP {response.status_code}"
+            except httpx.HTTPError as e:
+                error = str(e) or type(e).__name__
+            if error is None or attempt == JOB_WEBHOOK_RETRIES:
+                break
+            time.sleep(min(2 ** attempt, 30))
+
+        with self.lock:
+            self.webhooks["failed" if error else "delivered"] += 1
+        connections.sync_db.agent_jobs.update_one({"_id": job["_id"]}, {"$set": {
+            "webhook.delivered": error is None, "webhook.attempts": attempt, "webhook.error": error}})
+
+
+job_queue = JobQueue()
@@ -0,0 +1,76 @@
+"""
+Fast JSON encoding of MongoDB results through orjson.
+
+orjson serializes dicts, lists, str/int/float and datetimes in C; only the
+BSON-specific types go through default(). Naive datetimes are what pymongo
+returns for UTC, so they are written as ISO 8601 with a trailing "Z". Unlike
+bson.json_util there is no {"$oid": ...}/{"$date": ...} wrapping: ObjectIds
+become their hex string and decimals become numbers, which is what API
+clients want.
+"""
+import base64
+from decimal import Decimal
+import orjson
+from bson import ObjectId
+from bson.decimal128 import Decimal128
+from fastapi.responses import Response
+
+# OPT_NAIVE_UTC labels every naive datetime as UTC. That holds for values read
+# back from Mongo, and is only true for values built in Python if every
+# writer uses datetime.utcnow() (never datetime.now()), including the mock
+# and seed generators in data/
+OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+
+def default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, Decimal128):
+        return float(value.to_decimal())
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, bytes):
+        return base64.b64encode(value).decode()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    return str(value)
+
+def dumps(data, fields=None, newline: bool = False) -> bytes:
+    """Encode data to JSON bytes, optionally keeping only the given top-level fields"""
+    if fields:
+        data = project(data, fields)
+    option = (OPTIONS | orjson.OPT_APPEND_NEWLINE) if newline else OPTIONS
+    return orjson.dumps(data, default=default, option=option)
+
+def project(data, fields):
+    """
+    Keep only fields of each document. Applies to a document, a list of
+    documents, or the items of a {"items": [...], "next_token": ...} page.
+    """
+    fields = set(fields)
+    if isinstance(data, list):
+        return [project(doc, fields) for doc in data]
+    if isinstance(data, dict):
+        if isinstance(data.get("items"), list) and "next_token" in data:
+            return {**data, "items": project(data["items"], fields)}
+        return {key: value for key, value in data.items() if key in fields}
+    return data
+
+def parse_fields(fields: str = None):
+    """"name,email" query parameter -> ["name", "email"], or None for everything"""
+    if not fields:
+        return None
+    return [field.strip() for field in fields.split(",") if field.strip()] or None
+
+
+class MongoJSONResponse(Response):
+    """FastAPI response class for raw MongoDB results; return it directly from a route"""
+
+    media_type = "application/json"
+
+    def __init__(self, content, fields=None, **kwargs):
+        self.fields = fields
+        super().__init__(content, **kwargs)
+
+    def render(self, content) -> bytes:
+        return dumps(content, self.fields)
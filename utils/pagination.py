@@ -0,0 +1,64 @@
+"""
+Keyset pagination for the list queries.
+
+A page is fetched with the query's sort plus "after the last row of the
+previous page" instead of skip(), so every page costs the same however
+deep it is. The continuation token is the last row's sort-key values,
+BSON-JSON encoded (dates survive the round trip) and base64url wrapped so
+callers treat it as opaque.
+"""
+import base64
+import binascii
+import os
+from datetime import datetime
+from bson import json_util, ObjectId
+
+PAGE_SIZE_MAX = int(os.getenv("PAGE_SIZE_MAX", "200"))
+
+# types a sort key can hold; anything else (a dict such as {"$ne": null}, a
+# Regex or Code decoded by json_util) would become an operator in the filter
+KEY_TYPES = (str, int, float, bool, datetime, ObjectId, type(None))
+
+
+class InvalidPageToken(ValueError):
+    """The continuation token was not produced by this API."""
+
+
+def page_size(limit) -> int:
+    return max(1, min(int(limit), PAGE_SIZE_MAX))
+
+def encode_token(doc: dict, sort) -> str:
+    values = [doc.get(field) for field, _ in sort]
+    return base64.urlsafe_b64encode(json_util.dumps(values).encode()).decode().rstrip("=")
+
+def decode_token(token: str, sort) -> list:
+    try:
+        values = json_util.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise InvalidPageToken("Invalid page_token")
+    if not isinstance(values, list) or len(values) != len(sort):
+        raise InvalidPageToken("Invalid page_token")
+    # the token is client controlled and its values go straight into the filter
+    if not all(isinstance(value, KEY_TYPES) for value in values):
+        raise InvalidPageToken("Invalid page_token")
+    return values
+
+def after(query: dict, sort, token: str = None) -> dict:
+    """query restricted to rows sorting strictly after the token's row"""
+    if not token:
+        return query
+    values = decode_token(token, sort)
+    # (a, b) > (x, y)  <=>  a > x  or  (a == x and b > y)
+    branches = []
+    for i, (field, direction) in enumerate(sort):
+        branch = {f: v for (f, _), v in zip(sort[:i], values[:i])}
+        branch[field] = {"$gt" if direction == 1 else "$lt": values[i]}
+        branches.append(branch)
+    keyset = branches[0] if len(branches) == 1 else {"$or": branches}
+    return {"$and": [query, keyset]} if query else keyset
+
+def page(docs: list, sort, limit: int) -> dict:
+    """Shape limit + 1 fetched rows into a page; the extra row only signals more"""
+    items = docs[:limit]
+    more = len(docs) > limit
+    return {"items": items, "next_token": encode_token(items[-1], sort) if more else None}
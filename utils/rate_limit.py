@@ -0,0 +1,145 @@
+"""
+Process-wide controls for LLM provider calls: a token-bucket rate limiter,
+retries with exponential backoff for 429/5xx, and coalescing of identical
+in-flight calls so concurrent duplicates share one provider request.
+"""
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future
+
+LLM_RPM = float(os.getenv("LLM_RPM", "15"))
+LLM_BURST = int(os.getenv("LLM_BURST", "5"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", "1"))
+LLM_RETRY_MAX_SECONDS = float(os.getenv("LLM_RETRY_MAX_SECONDS", "30"))
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Blocking token bucket: rate_per_minute sustained, up to burst at once."""
+
+    def __init__(self, rate_per_minute: float = LLM_RPM, burst: int = LLM_BURST):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(burst, 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+        self.acquired = 0
+        self.waited_seconds = 0.0
+
+    def acquire(self):
+        started = time.monotonic()
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    self.acquired += 1
+                    self.waited_seconds += now - started
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "rpm": round(self.rate * 60, 2),
+                "burst": self.capacity,
+                "acquired": self.acquired,
+                "avg_wait_ms": round(self.waited_seconds / self.acquired * 1000, 1) if self.acquired else 0.0,
+            }
+
+
+class Coalescer:
+    """Concurrent calls with the same key share the first caller's result."""
+
+    def __init__(self):
+        self.inflight = {}
+        self.lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+
+    def run(self, key, fn):
+        with self.lock:
+            future = self.inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self.inflight[key] = future
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                self.inflight.pop(key, None)
+
+    def stats(self):
+        with self.lock:
+            return {"provider_calls": self.leaders, "coalesced": self.coalesced, "in_flight": len(self.inflight)}
+
+
+def is_retryable(error: Exception) -> bool:
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    if status in RETRYABLE_STATUS:
+        return True
+    # litellm names its transient errors consistently across providers
+    return type(error).__name__ in {
+        "RateLimitError", "ServiceUnavailableError", "InternalServerError", "APIConnectionError", "Timeout",
+    }
+
+
+class Retrier:
+    def __init__(self, max_retries: int = LLM_MAX_RETRIES, base: float = LLM_RETRY_BASE_SECONDS,
+                 cap: float = LLM_RETRY_MAX_SECONDS):
+        self.max_retries = max_retries
+        self.base = base
+        self.cap = cap
+        self.lock = threading.Lock()
+        self.retries = 0
+        self.failures = 0
+
+    def run(self, fn):
+        attempt = 0
+        while True:
+            try:
+                return fn()
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    with self.lock:
+                        self.failures += 1
+                    raise
+                # full jitter keeps retrying workers from re-synchronising
+                delay = random.uniform(0, min(self.cap, self.base * 2 ** attempt))
+                attempt += 1
+                with self.lock:
+                    self.retries += 1
+                print(f"LLM call failed ({type(e).__name__}), retry {attempt}/{self.max_retries} in {delay:.1f}s")
+                time.sleep(delay)
+
+    def stats(self):
+        with self.lock:
+            return {"retries": self.retries, "failures": self.failures}
+
+
+llm_bucket = TokenBucket()
+llm_coalescer = Coalescer()
+llm_retrier = Retrier()
+
+
+def llm_stats():
+    return {"rate_limit": llm_bucket.stats(), "coalescing": llm_coalescer.stats(), "retry": llm_retrier.stats()}
@@ -0,0 +1,142 @@
+"""
+Cache of whole agent answers, checked before any crew, translation or
+Gemini call. Keys are (agent, data version, normalized prompt), so the
+same question from any session hits; any record_write() clears it. Only
+self-contained prompts are cached: write intents and prompts that refer
+back to the conversation ("its price", "the same client") always run, and
+callers run cacheable prompts without the session-memory prefix so the
+answer cannot depend on history. With RESPONSE_CACHE_SIMILARITY set, a
+prompt may also be answered by a cached prompt whose character-trigram
+vector is at least that cosine-similar, as long as both mention exactly
+the same IDs and numbers ("orders for CLIENT_0001" never answers
+"CLIENT_0002").
+
+The data version is per process: a write handled by another uvicorn worker
+does not clear this worker's entries, so with several workers answers can
+be up to RESPONSE_CACHE_TTL stale.
+"""
+import math
+import os
+import re
+import threading
+from collections import Counter
+from utils.cache import TTLCache, MISSING, data_version, on_write
+
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "512"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "600"))
+# 0 disables similarity matching; only identical normalized prompts hit
+RESPONSE_CACHE_SIMILARITY = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0"))
+
+# prompts that ask the agent to change data are always run
+WRITE_INTENT_RE = re.compile(r"\b(create|book|register|enrol|enroll|cancel|add|update|delete|place|pay)\b", re.I)
+# pronouns and back-references whose meaning comes from earlier turns
+BACK_REFERENCE_RE = re.compile(
+    r"\b(it|its|they|them|their|theirs|those|these|he|him|his|she|her|hers|same|previous|"
+    r"earlier|above|again|else|instead|also|that one|this one|last one)\b", re.I)
+# tokens that name a specific record or quantity; similar prompts must agree on them
+ID_TOKEN_RE = re.compile(r"\w*\d\w*")
+
+
+def normalize_prompt(prompt: str) -> str:
+    return " ".join(re.sub(r"[^\w\s]", " ", prompt.lower()).split())
+
+def id_tokens(text: str) -> frozenset:
+    return frozenset(ID_TOKEN_RE.findall(text))
+
+def trigram_vector(text: str) -> dict:
+    padded = f"  {text} "
+    counts = Counter(padded[i:i + 3] for i in range(len(padded) - 2))
+    norm = math.sqrt(sum(v * v for v in counts.values())) or 1.0
+    return {gram: v / norm for gram, v in counts.items()}
+
+def cosine(a: dict, b: dict) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(gram, 0.0) for gram, v in a.items())
+
+
+class ResponseCache:
+    def __init__(self, maxsize: int = RESPONSE_CACHE_SIZE, ttl: float = RESPONSE_CACHE_TTL,
+                 similarity: float = RESPONSE_CACHE_SIMILARITY):
+        self.entries = TTLCache(maxsize=maxsize, default_ttl=ttl)
+        self.similarity = similarity
+        self.lock = threading.Lock()
+        self.counts = {"exact_hits": 0, "similar_hits": 0, "misses": 0, "stored": 0, "uncacheable": 0}
+
+    def _count(self, key):
+        with self.lock:
+            self.counts[key] += 1
+
+    def cacheable(self, prompt: str) -> bool:
+        """True for read-only prompts that make sense without the conversation so far"""
+        return not WRITE_INTENT_RE.search(prompt) and not BACK_REFERENCE_RE.search(prompt)
+
+    def lookup(self, agent: str, prompt: str):
+        text = normalize_prompt(prompt)
+        version = data_version()
+        value = self.entries.get((agent, version, text))
+        if value is not MISSING:
+            self._count("exact_hits")
+            return value[2]
+
+        if self.similarity > 0:
+            vector = trigram_vector(text)
+            tokens = id_tokens(text)
+            best, best_score = MISSING, self.similarity
+            for (entry_agent, entry_version, _), (entry_vector, entry_tokens, response) in self.entries.items():
+                if entry_agent != agent or entry_version != version:
+                    continue
+                if entry_tokens != tokens:
+                    continue
+                score = cosine(vector, entry_vector)
+                if score >= best_score:
+                    best, best_score = response, score
+            if best is not MISSING:
+                self._count("similar_hits")
+                return best
+
+        self._count("misses")
+        return MISSING
+
+    def store(self, agent: str, prompt: str, version: int, response):
+        text = normalize_prompt(prompt)
+        self.entries.set((agent, version, text), (trigram_vector(text), id_tokens(text), response))
+        self._count("stored")
+
+    def get_or_run(self, agent: str, prompt: str, run, on_hit=None):
+        """
+        Return a cached answer for prompt or run() and cache its result.
+        Runs that changed data while executing (e.g. created an order) are
+        not cached; on_hit lets callers keep side effects such as memory.
+        run() must not use session memory when cacheable(prompt) is true.
+        """
+        if not self.cacheable(prompt):
+            self._count("uncacheable")
+            return run()
+
+        cached = self.lookup(agent, prompt)
+        if cached is not MISSING:
+            if on_hit:
+                on_hit()
+            return cached
+
+        version = data_version()
+        response = run()
+        if data_version() == version:
+            self.store(agent, prompt, version, response)
+        else:
+            self._count("uncacheable")
+        return response
+
+    def clear(self, _collections=()):
+        self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counts)
+        stats["cache"] = self.entries.stats()
+        return stats
+
+
+response_cache = ResponseCache()
+on_write(response_cache.clear)
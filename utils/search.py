@@ -0,0 +1,57 @@
+"""
+Normalized search fields for clients and classes.
+
+Writers store lowercase name/instructor tokens, a lowercase email and the
+phone's national number as digits next to the original values; readers
+match them with escaped, anchored prefix regexes so the lookups stay on an
+index. That makes email a prefix match: "jane.d" finds jane.doe@example.com
+but a domain or a fragment from the middle of the address does not.
+"""
+import re
+from bson.regex import Regex
+
+TOKEN_RE = re.compile(r"[^\W_]+", re.UNICODE)
+NON_DIGIT_RE = re.compile(r"\D")
+
+
+def normalize_text(value) -> str:
+    return " ".join(str(value or "").lower().split())
+
+def text_tokens(value) -> list:
+    return TOKEN_RE.findall(normalize_text(value))
+
+def phone_digits(value) -> str:
+    """
+    Digits of the national number: a North American country code ("+1-",
+    "001-") is dropped, so "555-123-4567" and "+1-555-123-4567" match.
+    NANP area codes never start with 0 or 1, so this cannot eat a local digit.
+    """
+    digits = NON_DIGIT_RE.sub("", str(value or ""))
+    if digits.startswith("001"):
+        return digits[3:]
+    if digits.startswith("1"):
+        return digits[1:]
+    return digits
+
+def client_search_fields(client: dict) -> dict:
+    """Derived fields to store on a client document"""
+    return {
+        "name_tokens": text_tokens(client.get("name")),
+        "email_lower": normalize_text(client.get("email")),
+        "phone_digits": phone_digits(client.get("phone")),
+    }
+
+def class_search_fields(class_doc: dict) -> dict:
+    """Derived fields to store on a class document"""
+    return {"instructor_tokens": text_tokens(class_doc.get("instructor"))}
+
+def prefix(value: str) -> Regex:
+    """Case-sensitive anchored regex; user text is escaped, never interpreted"""
+    return Regex("^" + re.escape(value))
+
+def tokens_prefix_query(value):
+    """Every word of value must prefix-match one of the stored tokens"""
+    tokens = text_tokens(value)
+    if not tokens:
+        return None
+    return {"$all": [prefix(token) for token in tokens]}
@@ -0,0 +1,138 @@
+"""
+Server-sent events for agent runs.
+
+CrewAI publishes tool and LLM-chunk events on a process-wide bus,
+synchronously on the thread running the crew. Each streaming request binds
+its EventStream to the worker thread that runs its crew, and the bus
+handlers below forward events from that thread to the stream's asyncio
+queue. They are subscribed by agents/crew_pool.py, so this module does not
+import CrewAI itself.
+
+Only the final answer is streamed as `token` events: chunks of each LLM call
+are held back until its "Final Answer:" marker, so ReAct thoughts and tool
+calls never reach the client. agents/llm.py calls begin_llm_call() before
+every provider attempt; if an earlier attempt already streamed answer
+tokens, a `reset` event tells the client to discard them.
+"""
+import asyncio
+import json
+import threading
+from contextlib import contextmanager
+
+_DONE = object()
+FINAL_ANSWER = "Final Answer:"
+_streams = {}  # thread id -> EventStream
+_streams_lock = threading.Lock()
+
+
+def sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+class EventStream:
+    """Events of one agent run, produced on a worker thread and consumed as SSE."""
+
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+        self.call_text = ""
+        self.answering = False
+        self.answer_sent = False
+
+    def emit(self, event: str, data):
+        """Thread-safe: queue an event for the SSE response"""
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, (event, data))
+
+    def begin_call(self):
+        """A new LLM call (or retry) starts; drop what the last one streamed"""
+        if self.answer_sent:
+            self.emit("reset", {})
+        self.call_text = ""
+        self.answering = False
+        self.answer_sent = False
+
+    def chunk(self, text: str):
+        """Forward the part of an LLM chunk that belongs to the final answer"""
+        if not self.answering:
+            # the marker may be split across chunks, so search the whole call so far
+            self.call_text += text
+            start = self.call_text.find(FINAL_ANSWER)
+            if start < 0:
+                return
+            self.answering = True
+            text = self.call_text[start + len(FINAL_ANSWER):].lstrip()
+            self.call_text = ""
+        if text:
+            self.answer_sent = True
+            self.emit("token", {"text": text})
+
+    @contextmanager
+    def bind(self):
+        """Route bus events raised on the current thread to this stream"""
+        thread_id = threading.get_ident()
+        with _streams_lock:
+            _streams[thread_id] = self
+        try:
+            yield self
+        finally:
+            with _streams_lock:
+                _streams.pop(thread_id, None)
+
+    async def events(self, future):
+        """Yield SSE frames until the run finishes, then its result or error"""
+        future.add_done_callback(lambda _: self.queue.put_nowait(_DONE))
+        yield sse("start", {})
+        while True:
+            item = await self.queue.get()
+            if item is _DONE:
+                break
+            yield sse(*item)
+        try:
+            result = future.result()
+            raw = result["raw"] if isinstance(result, dict) else getattr(result, "raw", str(result))
+            yield sse("result", {"raw": raw})
+        except Exception as e:
+            yield sse("error", {"detail": str(e)})
+
+
+def _current():
+    return _streams.get(threading.get_ident())
+
+def _forward(event: str, data):
+    stream = _current()
+    if stream:
+        stream.emit(event, data)
+
+def begin_llm_call():
+    """Called by the LLM wrapper before each provider attempt on this thread"""
+    stream = _current()
+    if stream:
+        stream.begin_call()
+
+def replay_llm_result(text: str):
+    """Stream a result this thread got without calling the provider (coalesced)"""
+    stream = _current()
+    if stream:
+        stream.begin_call()
+        stream.chunk(text)
+
+
+def forward_crew_events(bus, started_event, finished_event, error_event, chunk_event):
+    bus.on(started_event)(_on_tool_started)
+    bus.on(finished_event)(_on_tool_finished)
+    bus.on(error_event)(_on_tool_error)
+    bus.on(chunk_event)(_on_llm_chunk)
+
+def _on_tool_started(source, event):
+    _forward("tool_start", {"tool": event.tool_name, "args": event.tool_args})
+
+def _on_tool_finished(source, event):
+    _forward("tool_end", {"tool": event.tool_name, "from_cache": getattr(event, "from_cache", False)})
+
+def _on_tool_error(source, event):
+    _forward("tool_error", {"tool": event.tool_name, "error": str(event.error)})
+
+def _on_llm_chunk(source, event):
+    stream = _current()
+    if stream:
+        stream.chunk(event.chunk)
@@ -0,0 +1,256 @@
+"""
+Request instrumentation: labelled latency histograms, per-request traces
+and Prometheus text exposition.
+
+stage(name, label) times one span of work (memory, translate, llm, tools,
+mongo, ...). Every span feeds the stage_duration_seconds histogram, and if
+a trace is active in the current context it is also appended to that
+trace, so GET /traces/{trace_id} shows where one request spent its time.
+With METRICS_ENABLED=false spans are a shared no-op and the MongoDB tools
+are left unwrapped.
+"""
+import asyncio
+import contextvars
+import functools
+import inspect
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from collections import OrderedDict
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+# recent traces kept in memory for GET /traces/{trace_id}
+TRACE_BUFFER = int(os.getenv("TRACE_BUFFER", "200"))
+
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    """Cumulative latency histogram keyed by a tuple of label values."""
+
+    def __init__(self, name: str, help: str, labelnames, buckets=BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.series = {}  # labels -> [count, sum, max, per-bucket counts]
+
+    def record(self, labels: tuple, seconds: float):
+        index = bisect_left(self.buckets, seconds)
+        with self.lock:
+            entry = self.series.get(labels)
+            if entry is None:
+                entry = self.series[labels] = [0, 0.0, 0.0, [0] * (len(self.buckets) + 1)]
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+            entry[3][index] += 1
+
+    def exposition(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            series = [(labels, entry[0], entry[1], list(entry[3])) for labels, entry in self.series.items()]
+        for labels, count, total, bucket_counts in sorted(series):
+            base = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(self.labelnames, labels))
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), bucket_counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{self.name}_bucket{{{base},le="{le}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{base}}} {total}")
+            lines.append(f"{self.name}_count{{{base}}} {count}")
+        return lines
+
+
+class StageTimer(Histogram):
+    def stats(self):
+        """Per-stage totals across labels, as served by GET /stages/stats"""
+        totals = {}
+        with self.lock:
+            for (stage_name, _), (count, total, longest, _) in self.series.items():
+                entry = totals.setdefault(stage_name, [0, 0.0, 0.0])
+                entry[0] += count
+                entry[1] += total
+                entry[2] = max(entry[2], longest)
+        return {
+            stage_name: {
+                "count": count,
+                "total_ms": round(total * 1000, 3),
+                "avg_ms": round(total / count * 1000, 3),
+                "max_ms": round(longest * 1000, 3),
+            }
+            for stage_name, (count, total, longest) in totals.items()
+        }
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+stage_timer = StageTimer("stage_duration_seconds", "Time spent in each request stage", ("stage", "name"))
+request_timer = Histogram("http_request_duration_seconds", "HTTP request latency", ("method", "route", "status"))
+
+
+# ------------------------- traces -------------------------
+
+class Trace:
+    def __init__(self, trace_id: str, client_trace_id: str = None):
+        self.trace_id = trace_id
+        self.client_trace_id = client_trace_id
+        self.started = time.perf_counter()
+        self.spans = []  # (stage, name, start offset ms, duration ms); appended from worker threads too
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "client_trace_id": self.client_trace_id,
+            "spans": [
+                {"stage": s, "name": n, "start_ms": round(start, 3), "duration_ms": round(duration, 3)}
+                for s, n, start, duration in sorted(self.spans, key=lambda span: span[2])
+            ],
+        }
+
+
+_current_trace = contextvars.ContextVar("trace", default=None)
+_recent_traces = OrderedDict()
+_traces_lock = threading.Lock()
+
+
+def start_trace(trace_id: str = None, client_trace_id: str = None) -> Trace:
+    """
+    Begin a trace for the current context (one request). trace_id must come
+    from the server; an id the client sent is only recorded as
+    client_trace_id, so no client can overwrite or guess another's trace.
+    """
+    trace = Trace(trace_id or uuid.uuid4().hex, client_trace_id[:128] if client_trace_id else None)
+    _current_trace.set(trace)
+    with _traces_lock:
+        _recent_traces[trace.trace_id] = trace
+        while len(_recent_traces) > TRACE_BUFFER:
+            _recent_traces.popitem(last=False)
+    return trace
+
+def current_trace_id():
+    trace = _current_trace.get()
+    return trace.trace_id if trace else None
+
+def get_trace(trace_id: str):
+    with _traces_lock:
+        trace = _recent_traces.get(trace_id)
+    return trace.to_dict() if trace else None
+
+def in_context(fn):
+    """Bind fn to a copy of the caller's context, so worker threads keep the trace"""
+    return functools.partial(contextvars.copy_context().run, fn)
+
+
+# ------------------------- spans -------------------------
+
+class _Span:
+    __slots__ = ("stage", "name", "started")
+
+    def __init__(self, stage_name: str, name: str):
+        self.stage = stage_name
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.stage, time.perf_counter() - self.started, self.name, self.started)
+        return False
+
+
+class _NoSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NO_SPAN = _NoSpan()
+
+
+def record(stage_name: str, seconds: float, name: str = "", started: float = None):
+    stage_timer.record((stage_name, name), seconds)
+    trace = _current_trace.get()
+    if trace is not None:
+        started = time.perf_counter() - seconds if started is None else started
+        trace.spans.append((stage_name, name, (started - trace.started) * 1000, seconds * 1000))
+
+def stage(stage_name: str, name: str = ""):
+    """Context manager timing one span of a request"""
+    return _Span(stage_name, name) if METRICS_ENABLED else _NO_SPAN
+
+
+def instrument(stage_name: str):
+    """Class decorator: time every public method (sync or async) as stage_name/<method>"""
+    def decorate(cls):
+        if not METRICS_ENABLED:
+            return cls
+        for attr, fn in list(vars(cls).items()):
+            if attr.startswith("_") or not callable(fn):
+                continue
+            setattr(cls, attr, _timed(stage_name, attr, fn))
+        return cls
+    return decorate
+
+def _timed(stage_name, name, fn):
+    if inspect.isasyncgenfunction(fn):
+        # a generator's lifetime is the consumer's, not a span of this request
+        return fn
+    if asyncio.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(*args, **kwargs):
+            with _Span(stage_name, name):
+                return await fn(*args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with _Span(stage_name, name):
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+# ------------------------- exposition -------------------------
+
+_collectors = []
+
+def register_collector(collect):
+    """collect() -> [(name, type, help, {labels dict as tuple of pairs: value})] for /metrics"""
+    _collectors.append(collect)
+    return collect
+
+def exposition() -> str:
+    lines = stage_timer.exposition() + request_timer.exposition()
+    for collect in _collectors:
+        for name, kind, help, samples in collect():
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+            for labels, value in samples.items():
+                label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+                lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+# tools run synchronously on the crew's thread, between these two events
+_tool_started = {}
+
+def time_tool_events(bus, started_event, finished_event, error_event):
+    """Record a "tools" span per tool call; agents/crew_pool.py subscribes this once CrewAI is loaded"""
+    bus.on(started_event)(_on_tool_started)
+    bus.on(finished_event)(_on_tool_finished)
+    bus.on(error_event)(_on_tool_finished)
+
+def _on_tool_started(source, event):
+    if METRICS_ENABLED:
+        _tool_started[threading.get_ident()] = time.perf_counter()
+
+def _on_tool_finished(source, event):
+    started = _tool_started.pop(threading.get_ident(), None)
+    if started is not None:
+        record("tools", time.perf_counter() - started, event.tool_name, started)
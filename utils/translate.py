@@ -1,7 +1,86 @@
+import os
+import re
+import threading
+from utils.cache import TTLCache, MISSING
+
+TRANSLATION_CACHE_SIZE = int(os.getenv("TRANSLATION_CACHE_SIZE", "1024"))
+TRANSLATION_CACHE_TTL = float(os.getenv("TRANSLATION_CACHE_TTL", "86400"))
+# share of known English words a prompt needs to skip translation
+ENGLISH_THRESHOLD = float(os.getenv("ENGLISH_THRESHOLD", "0.5"))
+
+WORD_RE = re.compile(r"[^\W\d_]+", re.UNICODE)
+
+# common English function words plus the studio's own vocabulary, so short
+# prompts like "total revenue" or "upcoming yoga classes" are recognised
+ENGLISH_WORDS = frozenset("""
+a about after all am an and any are as at be been before by can could did do does
+for from get give had has have how i if in is it its list me my no not of on or our
+please show should tell than that the their them there these this those to up us was
+we were what when where which who why will with would you your each many much most
+more less last next this today tomorrow yesterday week month year day days new old
+find search check book cancel create register need want like let see make top best
+total revenue sales income earnings outstanding pending paid unpaid due dues payment
+payments order orders status client clients customer customers member members active
+inactive count number enrollment enrollments enrolled trend trends service services
+course courses class classes session sessions schedule scheduled upcoming attendance
+rate rates percentage completion completed instructor instructors trainer studio
+fitness yoga pilates hiit strength cardio dance zumba crossfit meditation morning
+evening beginner advanced training workout details detail name email phone id
+""".split())
+
+_stats_lock = threading.Lock()
+_stats = {"calls": 0, "skipped_english": 0, "cache_hits": 0, "llm_calls": 0, "failures": 0}
+translation_cache = TTLCache(maxsize=TRANSLATION_CACHE_SIZE, default_ttl=TRANSLATION_CACHE_TTL)
+
+
+def _count(key):
+    with _stats_lock:
+        _stats[key] += 1
+
+def translation_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["skip_rate"] = round((stats["skipped_english"] + stats["cache_hits"]) / stats["calls"], 4) if stats["calls"] else 0.0
+    stats["cache"] = translation_cache.stats()
+    return stats
+
+def normalize_prompt(text: str) -> str:
+    return " ".join(text.lower().split())
+
+def english_confidence(text: str) -> float:
+    """
+    Offline estimate of how likely text is English: 0 when it contains
+    non-Latin letters, otherwise the share of its words found in
+    ENGLISH_WORDS. Prompts with no words at all (IDs, numbers) count as English.
+    """
+    words = WORD_RE.findall(text.lower())
+    if not words:
+        return 1.0
+    if any(not ("a" <= ch <= "z") for word in words for ch in word):
+        return 0.0
+    return sum(word in ENGLISH_WORDS for word in words) / len(words)
+
+def is_english(text: str) -> bool:
+    return english_confidence(text) >= ENGLISH_THRESHOLD
+
+
 def translate_to_english(llm, user_input: str) -> str:
     """
     Translate non-English queries to English using CrewAI's LLM.
+    English prompts skip the LLM entirely; earlier translations are
+    served from an LRU cache keyed on the normalized prompt.
     """
+    _count("calls")
+    if is_english(user_input):
+        _count("skipped_english")
+        return user_input
+
+    key = normalize_prompt(user_input)
+    cached = translation_cache.get(key)
+    if cached is not MISSING:
+        _count("cache_hits")
+        return cached
+
     prompt = f"""
     Translate this text to English:
 
@@ -9,18 +88,22 @@ def translate_to_english(llm, user_input: str) -> str:
 
     Return only the English translation without extra notes or formatting.
     """
-    
-    
+
+
     try:
-        
+        _count("llm_calls")
         response = llm.call(prompt)
-        return response.strip()
+        translated = response.strip()
     except AttributeError:
-        
+
         try:
             response = llm.generate(prompt)
-            return response.strip()
+            translated = response.strip()
         except AttributeError:
-            
+
             print(f"Warning: Could not translate '{user_input}', using original text")
+            _count("failures")
             return user_input
+
+    translation_cache.set(key, translated)
+    return translated